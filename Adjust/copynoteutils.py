@@ -1,4 +1,14 @@
 import flpianoroll as flp
+import struct
+
+binaryMagic = b'FLPN'
+"Leading bytes of the binary format"
+binaryVersion = 1
+"Version of the binary format, increment when records change"
+binaryHeader = struct.Struct('<4sHHI')
+"Binary header: magic, version, PPQ, note count"
+binaryRecord = struct.Struct('<HqqfffBffhH??')
+"Binary note record: number, time, length (ticks), pan, velocity, release, color, fcut, fres, pitchofs, repeats, slide, porta"
 
 def serialize(notes: list[flp.Note], timeOffset: int = 0) -> str:
   """Serializes notes to text.
@@ -83,4 +93,74 @@ def deserialize(serialized: str, timeOffset: int = 0) -> list[flp.Note]:
     except Exception:
       pass
 
-  return notes
\ No newline at end of file
+  return notes
+
+def serializeBinary(notes: list[flp.Note], timeOffset: int = 0) -> bytes:
+  """Serializes notes to binary, one fixed-width record per note.
+
+  Times and lengths are stored in ticks, together with the PPQ they refer to.
+
+  Args:
+    notes (list[Note]): Notes to serialize
+    timeOffset (int): Optional, ppq time offset applied for serialization
+  """
+  pack = binaryRecord.pack
+  records = [pack(note.number, note.time - timeOffset, note.length, note.pan, note.velocity, note.release,
+    note.color, note.fcut, note.fres, note.pitchofs, note.repeats, note.slide, note.porta) for note in notes]
+
+  header = binaryHeader.pack(binaryMagic, binaryVersion, flp.score.PPQ, len(records))
+  return header + b''.join(records)
+
+def deserializeBinary(serialized: bytes, timeOffset: int = 0) -> list[flp.Note]:
+  """Deserializes notes from binary.
+
+  Args:
+    serialized (bytes): Serialized binary of notes
+    timeOffset (int): Optional, ppq time offset applied to notes
+
+  Raises:
+    ValueError: if data isn't binary serialized notes of a supported version
+  """
+  data = memoryview(serialized)
+  if len(data) < binaryHeader.size:
+    raise ValueError('binary notes header missing')
+  magic, version, ppq, count = binaryHeader.unpack_from(data)
+  if magic != binaryMagic or version != binaryVersion:
+    raise ValueError(f'unsupported binary notes format (version {version})')
+
+  # ignore a truncated last record, just like unparsable text lines
+  count = min(count, (len(data) - binaryHeader.size) // binaryRecord.size)
+  records = data[binaryHeader.size:binaryHeader.size + count * binaryRecord.size]
+  # rescale if notes were copied at another PPQ
+  scale = flp.score.PPQ / ppq
+
+  notes = []
+  for number, time, length, pan, velocity, release, color, fcut, fres, pitchofs, repeats, slide, porta in struct.iter_unpack(binaryRecord.format, records):
+    note = flp.Note()
+    note.number = number
+    note.time = round(time * scale) + timeOffset
+    note.length = round(length * scale)
+    note.pan = pan
+    note.velocity = velocity
+    note.release = release
+    note.color = color
+    note.fcut = fcut
+    note.fres = fres
+    note.pitchofs = pitchofs
+    note.repeats = repeats
+    note.slide = slide
+    note.porta = porta
+    notes.append(note)
+
+  return notes
+
+def load(serialized: bytes, timeOffset: int = 0) -> list[flp.Note]:
+  """Deserializes notes from either format, detected by the binary magic.
+
+  Args:
+    serialized (bytes): Serialized binary or text of notes
+    timeOffset (int): Optional, ppq time offset applied to notes
+  """
+  if serialized[:len(binaryMagic)] == binaryMagic:
+    return deserializeBinary(serialized, timeOffset)
+  return deserialize(serialized.decode(), timeOffset)
\ No newline at end of file
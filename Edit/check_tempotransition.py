@@ -0,0 +1,180 @@
+"""
+Regression check for tempotransition.py, run outside of FL Studio: python check_tempotransition.py [cases]
+
+Compares TempoTransition against the original tick by tick implementation (kept below as reference), which long
+transitions no longer use: they're solved pulse by pulse (see `analyticPulses`), which has to give the very same ticks.
+Cases are
+- randomized: tempos in BPM and note values, durations up to 64 bars, with and without tension, all sweep and phase
+  correction modes, subdivisions
+- a grid of pulse lengths that divide the durations evenly, so accumulated pulses land on whole pulse numbers and ties
+  are common
+
+getTransitionInfo has to give the same count and start/end time as TempoTransition, for all cases.
+
+The copy in "Generate (rhythm)" has to be identical.
+"""
+
+import itertools
+import math
+import os
+import random
+import sys
+
+import tempotransition as tt
+
+def referenceTension(value: float, rate: float):
+  "Original Tension function (knob mode)"
+  if rate == 0: return value
+  return (pow(2, -10 * rate * value) - 1) / (pow(2, -10 * rate) - 1)
+
+def referenceTransition(l0: float, l1: float, dt: int, p0: int = 0, p1: int = 0, subdiv: int = 1, sweepMode: int = 0, tension: float = 0, phaseMode: int = 0, phaseTension: float = 0) -> tuple[list[int], int, int]:
+  """Original TempoTransition, accumulating the pulse rate tick by tick.
+
+  Returns:
+    tuple[list[int], int, int]: pulses, t0, t1
+  """
+  pulses: list[int] = []
+
+  l0 /= subdiv
+  l1 /= subdiv
+  p0 *= subdiv
+  p1 *= subdiv
+
+  r0 = 1 / l0
+  r1 = 1 / l1
+
+  for p in range(p0):
+    pulses.append(round(p * l0))
+  t0 = round(p0 * l0)
+
+  tpulses: list[int] = []
+  dp = 0
+  p_next = 0
+  for t in range(dt + 1):
+    t_star = t / dt
+    if sweepMode == 0:
+      dp += (r1 - r0) * referenceTension(t_star, tension) + r0
+    else:
+      dp += 1 / ((l1 - l0) * referenceTension(t_star, tension) + l0)
+    if dp >= p_next:
+      tpulses.append(t)
+      p_next += 1
+
+  ttrans = tpulses[-1]
+  corrRequired = ttrans != dt or (subdiv > 1 and len(tpulses) % subdiv != 1)
+
+  if phaseMode and dp < subdiv: phaseMode = 2
+
+  if phaseMode == 2 and corrRequired:
+    t = dt
+    while True:
+      t += 1
+      dp += r1
+      if dp >= p_next:
+        tpulses.append(t)
+        p_next += 1
+        if subdiv == 1:
+          break
+        elif len(tpulses) % subdiv == 1:
+          break
+    ttrans = tpulses[-1]
+  elif phaseMode == 1 and corrRequired and subdiv > 1:
+    while len(tpulses) % subdiv != 1:
+      del tpulses[-1]
+      dp -= 1
+    ttrans = tpulses[-1]
+  elif phaseMode == 0 and dp < subdiv:
+    p1 += (subdiv - math.floor(dp))
+
+  dp = math.floor(dp)
+
+  if phaseMode == 0 or not corrRequired:
+    ttransEff = ttrans
+  else:
+    ttransEff = dt
+    for p in range(dp + 1):
+      t = tpulses[p]
+      s = ttransEff / ttrans
+      sf0 = referenceTension(t / ttrans, phaseTension)
+      t = t * (1 + sf0 * (s - 1))
+      tpulses[p] = round(t)
+
+  del tpulses[-1]
+
+  pulses.extend([t + t0 for t in tpulses])
+
+  t1 = t0 + ttransEff
+  for p in range(p1):
+    pulses.append(round(p * l1) + t1)
+
+  pulses.append(round(p1 * l1) + t1)
+  return pulses, t0, t1
+
+def randomCases(rng: random.Random, count: int) -> list[tuple]:
+  """Returns randomized transition arguments."""
+  cases = []
+  for i in range(count):
+    ppq = rng.choice([96, 384, 960])
+    if rng.random() < 0.5:
+      # tempos in BPM (sometimes constant)
+      b0, b1 = rng.uniform(40, 240), rng.uniform(40, 240)
+      if rng.random() < 0.1: b1 = b0
+      l0 = 60 * ppq / b0 * rng.choice([1, 0.5, 0.25])
+      l1 = l0 * b0 / b1
+    else:
+      # note values
+      l0 = rng.choice([ppq, ppq / 2, ppq / 4, ppq * 2])
+      l1 = rng.choice([ppq, ppq / 2, ppq / 4, ppq * 2, ppq / 3])
+    if rng.random() < 0.1:
+      dt = rng.randint(1, 1023)
+    else:
+      dt = rng.randint(1024, ppq * 4 * rng.choice([4, 16, 64]))
+    tension = rng.choice([0, 0, rng.uniform(-1, 1), rng.uniform(-1e-3, 1e-3), round(rng.uniform(-1, 1), 2)])
+    cases.append((l0, l1, dt, rng.randint(0, 4), rng.randint(0, 4), rng.choice([1, 1, 2, 3, 4]), rng.randint(0, 1),
+      tension, rng.randint(0, 2), rng.choice([0, rng.uniform(-1, 1)])))
+  return cases
+
+def tieCases(rng: random.Random) -> list[tuple]:
+  """Returns transition arguments whose pulse lengths divide the durations evenly (a sample of the whole grid)."""
+  cases = []
+  lengths = [24, 48, 96, 120, 192, 384, 960]
+  for l0, l1 in itertools.product(lengths, lengths):
+    for dt in (1024, 1536, 3840, 7680, 9600, 30720):
+      for sweepMode, tension, phaseMode, subdiv in itertools.product((0, 1), (0, 0.5, -0.25), (0, 1, 2), (1, 2, 3)):
+        if rng.random() > 0.15: continue
+        cases.append((l0, l1, dt, 1, 2, subdiv, sweepMode, tension, phaseMode, 0.3))
+  return cases
+
+def main():
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+  rng = random.Random(0)
+
+  here = os.path.dirname(os.path.abspath(__file__))
+  with open(os.path.join(here, 'tempotransition.py'), 'rb') as f, open(os.path.join(here, '..', 'Generate (rhythm)', 'tempotransition.py'), 'rb') as g:
+    assert f.read() == g.read(), 'copy in "Generate (rhythm)" differs'
+
+  # count how often the pulse by pulse solver is used for all pulses (and not given up on)
+  solved = 0
+  analyticPulses = tt.analyticPulses
+  def countingAnalyticPulses(*args):
+    nonlocal solved
+    result = analyticPulses(*args)
+    if result is not None and (len(args) < 10 or args[9] is None): solved += 1
+    return result
+  tt.analyticPulses = countingAnalyticPulses
+
+  cases = randomCases(rng, count) + tieCases(rng)
+  for case in cases:
+    expected = referenceTransition(*case)
+    transition = tt.TempoTransition(*case)
+    actual = (list(transition.pulses), transition.t0, transition.t1)
+    assert actual == expected, (case, [(a, e) for a, e in zip(actual[0], expected[0]) if a != e][:5])
+
+    info = tt.getTransitionInfo(*case)
+    assert (info.count, info.t0, info.t1) == (transition.count, transition.t0, transition.t1), (case, 'getTransitionInfo')
+
+  assert solved > 0, 'pulse by pulse solver never used'
+  sys.stdout.write(f'{len(cases)} cases ok ({solved} solved pulse by pulse)\n')
+
+if __name__ == '__main__':
+  main()
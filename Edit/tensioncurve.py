@@ -0,0 +1,64 @@
+"""
+Title: Tension curve utility class
+Author: BinaryBorn
+
+Changelog:
+v1.0 (2026-10-18)
+  - initial version (replaces the Tension function copied into the scripts)
+"""
+
+from array import array
+from collections.abc import Iterable
+import math
+
+class TensionCurve:
+  "Represents the FL Studio Tension function for one tension rate"
+
+  def __init__(self, rate: float, knob=True):
+    """Create a tension curve, its constants are computed once.
+
+    Results are the same as the former `Tension(value, rate, knob)` function's, bit for bit.
+
+    Args:
+      rate (float): tension rate
+      knob (bool): if True, function behaves like the one behind knobs (e.g. scale levels), if False, it behaves like the one in Formula Controller
+    """
+    self.rate = rate
+    "Tension rate"
+    # rate mapping
+    R = rate
+    if not knob and rate > 0:
+      R = math.log2(rate + 1) / 10
+    elif not knob and rate < 0:
+      R = -math.log2(-rate + 1) / 10
+    # f(x,R) = (2^(-10*R*x)-1)/(2^(-10*R)-1)
+    self.k = -10 * R
+    "Exponent factor (-10*R)"
+    self.den = pow(2, self.k) - 1 if rate != 0 else 1
+    "Denominator (2^(-10*R)-1)"
+
+  def __call__(self, value: float) -> float:
+    """Applies the curve to a value.
+
+    Args:
+      value (float): value to skew
+    """
+    if self.rate == 0: return value
+    return (pow(2, self.k * value) - 1) / self.den
+
+  def apply(self, values: Iterable[float]) -> list[float] | array:
+    """Applies the curve to many values at once.
+
+    Args:
+      values (Iterable[float]): values to skew
+
+    Returns:
+      list[float] | array: skewed values, an array('d') if values is an array
+    """
+    if self.rate == 0:
+      result = list(values)
+    else:
+      k = self.k
+      den = self.den
+      result = [(pow(2, k * v) - 1) / den for v in values]
+    return array('d', result) if isinstance(values, array) else result
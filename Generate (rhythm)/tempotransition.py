@@ -7,27 +7,370 @@ v1.0 (2024-06-10)
   - initial version (copied from "Multiply with tempo transition" script)
   - CHANGED rates now given in pulse length (in ticks)
   - FIXED division by zero error when duration is too short
+v1.1 (2026-10-18)
+  - CHANGED long transitions are solved pulse by pulse instead of tick by tick (same pulses, a lot faster)
+v1.2 (2026-10-18)
+  - ADDED getTransition, which keeps the most recent transitions
+  - CHANGED pulses are a read-only array
+  - ADDED pulse count
+v1.3 (2026-10-18)
+  - CHANGED tension is applied by TensionCurve (tensioncurve.py)
+v1.4 (2026-10-18)
+  - ADDED getTransitionInfo, pulse count and start/end time without placing all pulses
 """
 
+from array import array
+from collections import deque
+from functools import lru_cache
 import math
+import sys
 
-def Tension(value: float, rate: float, knob=True):
-  """Applies the FL Studio Tension function to a value.
+from tensioncurve import TensionCurve
+
+analyticMinTicks = 1024
+"transitions at least this long (in ticks) are solved pulse by pulse (see `analyticPulses`), shorter ones tick by tick"
+analyticMinLength = 24
+"pulses at least this long on average (in ticks, subdivided) are solved pulse by pulse, shorter ones tick by tick"
+transitionCacheSize = 32
+"number of most recent transitions kept by `getTransition`"
+
+GAUSS_NODES = (-0.8611363115940526, -0.33998104358485626, 0.33998104358485626, 0.8611363115940526)
+"4-point Gauss-Legendre nodes on [-1, 1]"
+GAUSS_WEIGHTS = (0.34785484513745357, 0.6521451548625464, 0.6521451548625464, 0.34785484513745357)
+"4-point Gauss-Legendre weights on [-1, 1]"
+
+EPS = sys.float_info.epsilon
+
+def geometricExcess(c: float, n: float) -> float:
+  """Returns the sum of e^(c*k) - 1 for k from 0 to n - 1 (continued to real n).
+
+  The closed form cancels out for small c*n, a series is used there.
+  """
+  cn = c * n
+  if abs(cn) < 1e-3:
+    # power sums of k from 0 to n - 1
+    s1 = n * (n - 1) / 2
+    s2 = s1 * (2 * n - 1) / 3
+    s4 = s2 * (3 * n * n - 3 * n - 1) / 5
+    return c * (s1 + c * (s2 / 2 + c * (s1 * s1 / 6 + c * s4 / 24)))
+  return math.expm1(cn) / math.expm1(c) - n
+
+class TickAccumulator:
+  """Accumulates the pulse rate tick by tick on demand, exactly like `tickPulses` does."""
+  def __init__(self, r0: float, r1: float, l0: float, l1: float, dt: int, sweepMode: int, tension: float):
+    self.r0 = r0
+    self.r1 = r1
+    self.l0 = l0
+    self.l1 = l1
+    self.dt = dt
+    self.sweepMode = sweepMode
+    self.curve = TensionCurve(tension)
+    "tempo application tension curve"
+    self.t = -1
+    "last accumulated tick"
+    self.dp = 0
+    "accumulated pulses up to (and including) tick t"
+
+  def advance(self, t: int) -> float:
+    """Accumulates up to tick t (not before the last one) and returns the accumulated pulses."""
+    r0, r1, l0, l1, dt = self.r0, self.r1, self.l0, self.l1, self.dt
+    dp = self.dp
+    for f in self.curve.apply([tick / dt for tick in range(self.t + 1, t + 1)]):
+      if self.sweepMode == 0:
+        dp += (r1 - r0) * f + r0
+      else:
+        dp += 1 / ((l1 - l0) * f + l0)
+    self.t = max(self.t, t)
+    self.dp = dp
+    return dp
+
+def tickPulses(r0: float, r1: float, l0: float, l1: float, dt: int, sweepMode: int, tension: float, keep: int | None = None) -> tuple[int, list[int], float]:
+  """Finds the pulses of a transition by accumulating the pulse rate tick by tick.
+
+  Args:
+    r0 (float): start pulse rate (pulses per tick)
+    r1 (float): end pulse rate (pulses per tick)
+    l0 (float): start pulse length (in ticks)
+    l1 (float): end pulse length (in ticks)
+    dt (int): duration of transition (in ticks)
+    sweepMode (int): tempo sweep mode, 0: sweep frequency, 1: sweep pulse length
+    tension (float): tempo application tension
+    keep (int | None): number of pulses to keep, only the last ones (all if None)
+
+  Returns:
+    tuple[int, list[int], float]: number of pulses, pulses (in ticks, 0 to dt), accumulated pulses at dt
+  """
+  tpulses = [] if keep is None else deque(maxlen=keep)
+  dp = 0
+  p_next = 0
+  # dt must be included here (for spot-on-phase transitions, otherwise they'd be stretched/squashed)
+  skew = TensionCurve(tension).apply([t / dt for t in range(dt + 1)])
+  for t in range(dt + 1):
+    if sweepMode == 0:
+      dp += (r1 - r0) * skew[t] + r0
+    else:
+      dp += 1 / ((l1 - l0) * skew[t] + l0)
+    if dp >= p_next:
+      tpulses.append(t)
+      p_next += 1
+  return p_next, tpulses if keep is None else list(tpulses), dp
+
+class PulseCount:
+  """Accumulated pulses of a transition (the sum of the pulse rates of ticks 0 to t) as a smooth function of t.
+
+  In sweep frequency mode, the rates are a geometric (or, without tension, arithmetic) series, which has a closed form.
+  In sweep pulse length mode, the rate is integrated (in closed form for linear pulse lengths, otherwise numerically by
+  Gauss-Legendre) and corrected to the discrete sum by Euler-Maclaurin.
+  """
+  def __init__(self, r0: float, r1: float, l0: float, l1: float, dt: int, sweepMode: int, tension: float):
+    self.r0 = r0
+    self.r1 = r1
+    self.l0 = l0
+    self.l1 = l1
+    self.dt = dt
+    self.sweepMode = sweepMode
+    self.c = -10 * tension * math.log(2) / dt if tension else 0.0
+    "tension exponent (per tick)"
+    self.expDt = math.expm1(self.c * dt) if tension else 0.0
+    "tension curve denominator"
+    self.rmin = min(r0, r1)
+    "lowest rate"
+    self.rmax = max(r0, r1)
+    "highest rate"
+
+    # rounding of the tick engine: accumulating dt + 1 rates, plus the tension curve's own cancellation for weak tensions
+    total = self.rmax * (dt + 1)
+    noise = 0.0
+    if tension:
+      noise = 4 * EPS * max(1, math.exp(self.c * dt)) / abs(self.expDt)
+      if sweepMode == 0: noise *= abs(r1 - r0)
+      else: noise *= abs(l1 - l0) * self.rmax * self.rmax
+    self.error = (dt + 2) * (EPS * total + noise) + 64 * EPS * total
+    "upper bound of the difference to the pulses accumulated by the tick engine"
+
+    if sweepMode == 1:
+      # smoothness of the rate (per tick), its derivatives are about rate * omega^n
+      slope = abs(self.c * dt * max(1, math.exp(self.c * dt)) / self.expDt) if tension else 1
+      omega = abs(self.c) + abs(l1 - l0) * slope / (dt * min(l0, l1))
+      # Euler-Maclaurin is cut off after the third derivative
+      self.error += self.rmax * (2 * omega) ** 5 * (dt + 1)
+      self.start = -0.5
+      "start of the integration (midpoint rule)"
+      self.correction0 = self.correction(self.start)
+      "Euler-Maclaurin terms at `start`"
+      if self.c:
+        # short panels keep Gauss-Legendre well below the rounding
+        panels = math.ceil((dt + 1) / min(256, 0.1 / omega))
+        self.width = (dt + 1) / panels
+        "width of a panel"
+        self.error += 1e-4 * (self.width * omega) ** 8 * self.rmax * (dt + 1)
+        self.integrals = [0.0]
+        "integral of the rate from `start` to each panel boundary"
+        for i in range(panels):
+          a = self.start + i * self.width
+          self.integrals.append(self.integrals[-1] + self.integrate(a, a + self.width))
+
+  def length(self, x: float) -> float:
+    """Returns the pulse length at tick x (sweep pulse length mode)."""
+    if self.c: return self.l0 + (self.l1 - self.l0) * math.expm1(self.c * x) / self.expDt
+    return self.l0 + (self.l1 - self.l0) * x / self.dt
+
+  def rate(self, x: float) -> float:
+    """Returns the pulse rate at tick x."""
+    if self.sweepMode == 1: return 1 / self.length(x)
+    if self.c: return self.r0 + (self.r1 - self.r0) * math.expm1(self.c * x) / self.expDt
+    return self.r0 + (self.r1 - self.r0) * x / self.dt
+
+  def integrate(self, a: float, b: float) -> float:
+    """Returns the integral of the rate from a to b (sweep pulse length mode).
+
+    Linear pulse lengths are integrated in closed form, others by Gauss-Legendre.
+    """
+    if not self.c:
+      k = (self.l1 - self.l0) / self.dt
+      if k == 0: return (b - a) / self.l0
+      return math.log1p(k * (b - a) / self.length(a)) / k
+    h = (b - a) / 2
+    m = a + h
+    length = self.length
+    return h * sum([w / length(m + h * n) for n, w in zip(GAUSS_NODES, GAUSS_WEIGHTS)])
+
+  def correction(self, x: float) -> float:
+    """Returns the Euler-Maclaurin terms of the midpoint rule at x (sweep pulse length mode)."""
+    g = self.length(x)
+    if self.c:
+      g1 = (self.l1 - self.l0) * self.c * math.exp(self.c * x) / self.expDt
+    else:
+      g1 = (self.l1 - self.l0) / self.dt
+    g2 = self.c * g1
+    g3 = self.c * g2
+    # derivatives of the rate 1/g
+    f1 = -g1 / (g * g)
+    f3 = (-6 * g1 * g1 * g1 + 6 * g * g1 * g2 - g * g * g3) / (g * g * g * g)
+    return -f1 / 24 + 7 * f3 / 5760
+
+  def __call__(self, x: float) -> float:
+    """Returns the accumulated pulses at tick x (the sum of the rates of ticks 0 to x for whole x)."""
+    if self.sweepMode == 0:
+      if self.c: return self.r0 * (x + 1) + (self.r1 - self.r0) * geometricExcess(self.c, x + 1) / self.expDt
+      return self.r0 * (x + 1) + (self.r1 - self.r0) * x * (x + 1) / (2 * self.dt)
+    # sum of ticks 0 to x = integral from -1/2 to x + 1/2, corrected
+    b = x + 0.5
+    if not self.c: return self.integrate(self.start, b) + self.correction(b) - self.correction0
+    i = min(max(int((b - self.start) / self.width), 0), len(self.integrals) - 1)
+    a = self.start + i * self.width
+    return self.integrals[i] + self.integrate(a, b) + self.correction(b) - self.correction0
+
+def bracketPulse(S: PulseCount, p: int, lo: int, slo: float, hi: int, shi: float) -> tuple[int, float, int, float]:
+  """Narrows S(lo) < p <= S(hi) down to neighbouring ticks, by Newton's method on whole ticks.
+
+  Returns:
+    tuple[int, float, int, float]: lo, S(lo), hi, S(hi) with hi - lo <= 1
+  """
+  # first guess from the rate halfway to the next pulse
+  x = lo + (p - slo) / S.rate(lo + (p - slo) / (2 * S.rate(lo)))
+  while hi - lo > 1:
+    t = min(max(math.ceil(x), lo + 1), hi - 1)
+    s = S(t)
+    if s < p: lo, slo = t, s
+    else: hi, shi = t, s
+    x = t + (p - s) / S.rate(t)
+  return lo, slo, hi, shi
+
+def squashTooClose(dp: float, r1: float, subdiv: int, err: float) -> bool:
+  """Tells whether the pulses a squash phase correction adds after the transition (at rate r1, see `TempoTransition`)
+  are too close to call, given the accumulated pulses dp at dt and their error."""
+  count = math.floor(dp)
+  for p in range(count + 1, count + subdiv + 1):
+    m = math.ceil((p - dp) / r1)
+    errExt = err + 2 * EPS * (m + 1) * (dp + m * r1)
+    if dp + m * r1 - p <= errExt or p - (dp + (m - 1) * r1) <= errExt: return True
+  return False
+
+def analyticPulses(r0: float, r1: float, l0: float, l1: float, dt: int, sweepMode: int, tension: float, subdiv: int, phaseMode: int, keep: int | None = None) -> tuple[int, list[int], float] | None:
+  """Finds the pulses of a transition pulse by pulse, same as `tickPulses` does tick by tick.
+
+  Every pulse is placed by solving the accumulated pulses (see `PulseCount`) for its number with Newton's method on
+  whole ticks, bracketed by the previous pulse and the end of the transition. That takes a few evaluations per pulse
+  instead of one per tick.
+
+  The tick engine decides on rounded sums. Where the accumulated pulses are within its rounding error of a pulse
+  number (e.g. a tempo that divides evenly), the tick is decided by accumulating like the tick engine does, up to that
+  tick. Where that's not possible (the number of pulses, the pulses a squash phase correction may add after the
+  transition, and any pulse when only the last ones are kept), None is returned.
 
   Args:
-    value (float): value to skew
-    rate (float): tension rate
-    knob (bool): if True, function behaves like the one behind knobs (e.g. scale levels), if False, it behaves like the one in Formula Controller
+    r0 (float): start pulse rate (pulses per tick)
+    r1 (float): end pulse rate (pulses per tick)
+    l0 (float): start pulse length (in ticks)
+    l1 (float): end pulse length (in ticks)
+    dt (int): duration of transition (in ticks)
+    sweepMode (int): tempo sweep mode, 0: sweep frequency, 1: sweep pulse length
+    tension (float): tempo application tension
+    subdiv (int): pulse subdivision
+    phaseMode (int): phase correction mode, 0: none, 1: stretch, 2: squash
+    keep (int | None): number of pulses to place, only the last ones (all if None)
+
+  Returns:
+    tuple[int, list[int], float] | None: number of pulses, pulses (in ticks, 0 to dt), accumulated pulses at dt; None
+      if too close to call
   """
-  if rate == 0: return value
-  # rate mapping
-  R = rate
-  if not knob and rate > 0:
-    R = math.log2(rate + 1) / 10
-  elif not knob and rate < 0:
-    R = -math.log2(-rate + 1) / 10
-  # f(x,R) = (2^(-10*R*x)-1)/(2^(-10*R)-1)
-  return (pow(2, -10 * R * value) - 1) / (pow(2, -10 * R) - 1)
+  # the tick engine delays pulses that come faster than ticks
+  if max(r0, r1) >= 0.5: return None
+
+  S = PulseCount(r0, r1, l0, l1, dt, sweepMode, tension)
+  err = S.error
+  # at most one tick can be too close to call per pulse
+  if S.rmin <= 4 * err: return None
+  dp = S(dt)
+  count = math.floor(dp)
+  if dp - count <= err or count + 1 - dp <= err: return None
+
+  first = 0 if keep is None else max(count + 1 - keep, 0)
+  acc = None
+  tpulses = [0] if first == 0 else []
+  t, s = 0, S(0)
+  for p in range(max(first, 1), count + 1):
+    # S(lo) < p <= S(hi)
+    lo, slo, hi, shi = bracketPulse(S, p, t, s, dt, dp)
+
+    if shi - p > err and p - slo > err:
+      t = hi
+    elif keep is not None:
+      # the pulses before aren't known, so ties can't be accumulated
+      return None
+    else:
+      # too close to call, accumulate like the tick engine
+      if acc is None: acc = TickAccumulator(r0, r1, l0, l1, dt, sweepMode, tension)
+      if shi - p <= err:
+        t = hi if acc.advance(hi) >= p else hi + 1
+      else:
+        t = lo if lo > tpulses[-1] and acc.advance(lo) >= p else hi
+    s = shi if t == hi else slo if t == lo else S(t)
+    tpulses.append(t)
+
+  # pulses a squash phase correction adds (at rate r1 after dt), see `correctPulseCount`
+  corrRequired = tpulses[-1] != dt or (subdiv > 1 and (count + 1) % subdiv != 1)
+  if corrRequired and (phaseMode == 2 or phaseMode and dp < subdiv) and squashTooClose(dp, r1, subdiv, err): return None
+  return count + 1, tpulses, dp
+
+def transitionPulses(r0: float, r1: float, l0: float, l1: float, dt: int, sweepMode: int, tension: float, subdiv: int, phaseMode: int, keep: int | None = None) -> tuple[int, list[int], float]:
+  """Finds the pulses of a transition, pulse by pulse where possible (see `analyticPulses`), otherwise tick by tick
+  (see `tickPulses`), which have the same arguments and result."""
+  result = None
+  if dt >= analyticMinTicks and 2 / (r0 + r1) >= analyticMinLength:
+    result = analyticPulses(r0, r1, l0, l1, dt, sweepMode, tension, subdiv, phaseMode, keep)
+  if result is None:
+    result = tickPulses(r0, r1, l0, l1, dt, sweepMode, tension, keep)
+  return result
+
+def correctPulseCount(tpulses: list[int], count: int, dp: float, dt: int, r1: float, subdiv: int, phaseMode: int) -> tuple[int, float, int, bool, int]:
+  """Adds or drops the pulses of a phase correction, so the transition ends on a complete set of pulses.
+
+  Only the last pulses (at least `subdiv` of them) have to be given, they're changed in place.
+
+  Args:
+    tpulses (list[int]): (last) pulses of the transition (in ticks, 0 to dt)
+    count (int): number of pulses of the transition
+    dp (float): accumulated pulses at dt
+    dt (int): duration of transition (in ticks)
+    r1 (float): end pulse rate (pulses per tick)
+    subdiv (int): pulse subdivision
+    phaseMode (int): phase correction mode, 0: none, 1: stretch, 2: squash
+
+  Returns:
+    tuple[int, float, int, bool, int]: number of pulses, accumulated pulses, phase correction mode (squash if there's
+      no complete set of pulses), whether phase correction is required, pulses to add after the transition
+  """
+  corrRequired = tpulses[-1] != dt or (subdiv > 1 and count % subdiv != 1)
+
+  # if there's no complete set of pulses, phase correction is always squash
+  if phaseMode and dp < subdiv: phaseMode = 2
+
+  extra = 0
+  # if phase correction is set to squash and required, find one additional pulse
+  if phaseMode == 2 and corrRequired:
+    t = dt
+    while True:
+      t += 1
+      dp += r1
+      if dp >= count:
+        tpulses.append(t)
+        count += 1
+        if subdiv == 1:
+          break
+        elif count % subdiv == 1:
+          break
+  # if phase correction is set to stretch and required, drop incomplete set of pulses
+  elif phaseMode == 1 and corrRequired and subdiv > 1:
+    while count % subdiv != 1:
+      del tpulses[-1]
+      count -= 1
+      dp -= 1
+  # if no phase correction is set, make it complete at least one whole pulse
+  elif phaseMode == 0 and dp < subdiv:
+    extra = subdiv - math.floor(dp)
+  return count, dp, phaseMode, corrRequired, extra
 
 class TempoTransition:
   "Represents a tempo transition"
@@ -47,13 +390,15 @@ class TempoTransition:
       phaseMode (int): phase correction mode, 0: none, 1: stretch, 2: squash
       phaseTension (float): phase correction application tension
     """
-    self.pulses: list[int] = []
-    "List of pulses (in ticks)"
+    self.pulses: memoryview
+    "Pulses (in ticks), read-only view of an array('q')"
     self.t0: int
     "Transition start time (in ticks)"
     self.t1: int
     "Transition end time (in ticks)"
 
+    pulses: list[int] = []
+
     # apply subdivision to initial pulse definition
     l0 /= subdiv
     l1 /= subdiv
@@ -67,52 +412,14 @@ class TempoTransition:
     # before transition
     for p in range(p0):
       t = round(p * l0)
-      self.pulses.append(t)
+      pulses.append(t)
     self.t0 = round(p0 * l0)
 
     # transition
-    tpulses: list[int] = []
-    dp = 0
-    p_next = 0
-    for t in range(dt + 1): # dt must be included here (for spot-on-phase transitions, otherwise they'd be stretched/squashed)
-      t_star = t / dt
-      if sweepMode == 0:
-        dp += (r1 - r0) * Tension(t_star, tension) + r0
-      else:
-        dp += 1 / ((l1 - l0) * Tension(t_star, tension) + l0)
-      if dp >= p_next:
-        tpulses.append(t)
-        p_next += 1
-
+    count, tpulses, dp = transitionPulses(r0, r1, l0, l1, dt, sweepMode, tension, subdiv, phaseMode)
+    count, dp, phaseMode, corrRequired, extra = correctPulseCount(tpulses, count, dp, dt, r1, subdiv, phaseMode)
+    p1 += extra
     ttrans = tpulses[-1]
-    corrRequired = ttrans != dt or (subdiv > 1 and len(tpulses) % subdiv != 1)
-
-    # if there's no complete set of pulses, phase correction is always squash
-    if phaseMode and dp < subdiv: phaseMode = 2
-
-    # if phase correction is set to squash and required, find one additional pulse
-    if phaseMode == 2 and corrRequired:
-      t = dt
-      while True:
-        t += 1
-        dp += r1
-        if dp >= p_next:
-          tpulses.append(t)
-          p_next += 1
-          if subdiv == 1:
-            break
-          elif len(tpulses) % subdiv == 1:
-            break
-      ttrans = tpulses[-1]
-    # if phase correction is set to stretch and required, drop incomplete set of pulses
-    elif phaseMode == 1 and corrRequired and subdiv > 1:
-      while len(tpulses) % subdiv != 1:
-        del tpulses[-1]
-        dp -= 1
-      ttrans = tpulses[-1]
-    # if no phase correction is set, make it complete at least one whole pulse
-    elif phaseMode == 0 and dp < subdiv:
-      p1 += (subdiv - math.floor(dp))
 
     dp = math.floor(dp)
 
@@ -122,24 +429,84 @@ class TempoTransition:
     # apply phase correction
     else:
       ttransEff = dt
+      phaseCurve = TensionCurve(phaseTension)
       for p in range(dp + 1):
         t = tpulses[p]
         s = ttransEff / ttrans
-        sf0 = Tension(t / ttrans, phaseTension)
+        sf0 = phaseCurve(t / ttrans)
         t = t * (1 + sf0 * (s - 1))
         tpulses[p] = round(t)
 
     # drop the last pulse - will be appended later on
     del tpulses[-1]
 
-    self.pulses.extend([t + self.t0 for t in tpulses])
+    pulses.extend([t + self.t0 for t in tpulses])
 
     # after transition
     self.t1 = self.t0 + ttransEff
     for p in range(p1):
       t = round(p * l1)
-      self.pulses.append(t + self.t1)
-    
+      pulses.append(t + self.t1)
+
     # final pulse
     tend = round(p1 * l1)
-    self.pulses.append(tend + self.t1)
+    pulses.append(tend + self.t1)
+
+    self.pulses = memoryview(array('q', pulses)).toreadonly()
+
+  @property
+  def count(self) -> int:
+    "Number of pulses"
+    return len(self.pulses)
+
+def getTransition(l0: float, l1: float, dt: int, p0: int = 0, p1: int = 0, subdiv: int = 1, sweepMode: int = 0, tension: float = 0, phaseMode: int = 0, phaseTension: float = 0) -> TempoTransition:
+  """Returns the tempo transition for the given arguments (see `TempoTransition`).
+
+  The most recent transitions are kept (see `transitionCacheSize`), so a dialog preview only computes its transition
+  again when one of the arguments changes. Returned transitions are shared, their pulses are read-only.
+  """
+  return cachedTransition(l0, l1, dt, p0, p1, subdiv, sweepMode, tension, phaseMode, phaseTension)
+
+@lru_cache(maxsize=transitionCacheSize)
+def cachedTransition(l0: float, l1: float, dt: int, p0: int, p1: int, subdiv: int, sweepMode: int, tension: float, phaseMode: int, phaseTension: float) -> TempoTransition:
+  """Creates a tempo transition, cached by its (positional) arguments."""
+  return TempoTransition(l0, l1, dt, p0, p1, subdiv, sweepMode, tension, phaseMode, phaseTension)
+
+class TransitionInfo:
+  "Pulse count and start/end time of a tempo transition, without its pulses"
+
+  def __init__(self, count: int, t0: int, t1: int):
+    self.count = count
+    "Number of pulses, same as `TempoTransition.count`"
+    self.t0 = t0
+    "Transition start time (in ticks)"
+    self.t1 = t1
+    "Transition end time (in ticks)"
+
+def getTransitionInfo(l0: float, l1: float, dt: int, p0: int = 0, p1: int = 0, subdiv: int = 1, sweepMode: int = 0, tension: float = 0, phaseMode: int = 0, phaseTension: float = 0) -> TransitionInfo:
+  """Returns the pulse count and start/end time of a tempo transition (see `TempoTransition` for the arguments), the
+  same the transition would have.
+
+  Only the last pulses of the transition are placed: solved for directly where possible, otherwise accumulated tick by
+  tick without keeping the pulses before them.
+  """
+  # apply subdivision to initial pulse definition
+  l0 /= subdiv
+  l1 /= subdiv
+  p0 *= subdiv
+  p1 *= subdiv
+
+  # pulse rate (pulse per tick)
+  r0 = 1 / l0
+  r1 = 1 / l1
+
+  t0 = round(p0 * l0)
+
+  # number of pulses of the transition, enough of the last ones to drop an incomplete set, accumulated pulses
+  count, tail, dp = transitionPulses(r0, r1, l0, l1, dt, sweepMode, tension, subdiv, phaseMode, subdiv)
+  count, dp, phaseMode, corrRequired, extra = correctPulseCount(tail, count, dp, dt, r1, subdiv, phaseMode)
+
+  ttransEff = tail[-1] if phaseMode == 0 or not corrRequired else dt
+
+  # pulses before, transition pulses without the last one, pulses after, final pulse
+  return TransitionInfo(p0 + count + p1 + extra, t0, t0 + ttransEff)
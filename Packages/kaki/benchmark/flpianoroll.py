@@ -0,0 +1,145 @@
+"""
+Stand-in for FL Studio's flpianoroll module, so scripts can be run (and timed) outside of FL Studio.
+
+Only covers what the kaki scripts use. Dialogs return the default value of every input, unless it's been overridden
+in `ScriptDialog.values`.
+
+Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
+"""
+
+class Note:
+  """Note with FL Studio's default properties."""
+  def __init__(self):
+    self.number = 60
+    self.time = 0
+    self.length = 0
+    self.group = 0
+    self.pan = 0.5
+    self.velocity = 0.8
+    self.release = 0.5
+    self.color = 0
+    self.fcut = 0.5
+    self.fres = 0.5
+    self.pitchofs = 0
+    self.repeats = 0
+    self.slide = False
+    self.porta = False
+    self.muted = False
+    self.selected = False
+
+  def clone(self) -> 'Note':
+    note = Note()
+    note.__dict__.update(self.__dict__)
+    return note
+
+class Marker:
+  """Marker with FL Studio's default properties."""
+  def __init__(self):
+    self.time = 0
+    self.name = ''
+    self.mode = 0
+    self.tsnum = 4
+    self.tsden = 4
+
+class Score:
+  """Score, keeps its notes and markers in lists."""
+  def __init__(self):
+    self.PPQ = 96
+    self.tsnum = 4
+    self.tsden = 4
+    self.notes: list[Note] = []
+    self.markers: list[Marker] = []
+
+  @property
+  def noteCount(self) -> int:
+    return len(self.notes)
+
+  @property
+  def markerCount(self) -> int:
+    return len(self.markers)
+
+  def clear(self, all: bool = False):
+    self.notes.clear()
+    self.markers.clear()
+
+  def clearNotes(self, all: bool = False):
+    self.notes.clear()
+
+  def clearMarkers(self, all: bool = False):
+    self.markers.clear()
+
+  def addNote(self, note: Note):
+    self.notes.append(note.clone())
+
+  def getNote(self, index: int) -> Note:
+    return self.notes[index]
+
+  def deleteNote(self, index: int):
+    del self.notes[index]
+
+  def addMarker(self, marker: Marker):
+    self.markers.append(marker)
+
+  def getMarker(self, index: int) -> Marker:
+    return self.markers[index]
+
+  def deleteMarker(self, index: int):
+    del self.markers[index]
+
+  def getTimelineSelection(self) -> tuple[int, int]:
+    return (0, -1)
+
+  def getDefaultNoteProperties(self) -> Note:
+    return Note()
+
+  def getNextFreeGroupIndex(self) -> int:
+    return max((n.group for n in self.notes), default=0) + 1
+
+score = Score()
+
+class Utils:
+  """Logs to stdout."""
+  def log(self, msg: str):
+    print(msg)
+
+  def ShowMessage(self, msg: str):
+    print(msg)
+
+  def ProgressMsg(self, msg: str, pos: int, total: int):
+    pass
+
+Utils = Utils()
+
+class ScriptDialog:
+  """Dialog that only keeps the values of its inputs."""
+  def __init__(self, title: str, description: str):
+    self.values: dict[str, object] = {}
+    "value per input name"
+
+  def AddInput(self, name: str, value: float, hint: str = ''):
+    self.values[name] = value
+
+  def AddInputKnob(self, name: str, value: float, min: float, max: float, hint: str = ''):
+    self.values[name] = value
+
+  def AddInputKnobInt(self, name: str, value: int, min: int, max: int, reserved: int = 0, hint: str = ''):
+    self.values[name] = value
+
+  def AddInputCombo(self, name: str, options: list, value: int, hint: str = ''):
+    self.values[name] = value
+
+  def AddInputText(self, name: str, value: str, hint: str = ''):
+    self.values[name] = value
+
+  def AddInputCheckbox(self, name: str, value: bool, hint: str = ''):
+    self.values[name] = value
+
+  def AddInputSurface(self, name: str):
+    pass
+
+  def GetInputValue(self, name: str):
+    # surface controls aren't declared, FL Studio defaults them to the center
+    return self.values.get(name, 0.5)
+
+  def Execute(self) -> bool:
+    return True
\ No newline at end of file
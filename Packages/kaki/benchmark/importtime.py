@@ -0,0 +1,82 @@
+"""
+Import time benchmark for the kaki scripts.
+
+Every run starts a fresh interpreter (like FL Studio does when a script's dialog is opened) and measures
+- load: executing the script's module code, including `import kaki`
+- preview: `createDialog` and the first `apply`, including whatever kaki imports on first use
+Both are measured with the lazy `kaki` facade as is, and with all of its names resolved up front (like the facade
+used to import them).
+
+Usage: python importtime.py [--runs N] [script ...]
+
+Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+benchmarkDir = os.path.dirname(os.path.abspath(__file__))
+kakiDir = os.path.dirname(benchmarkDir)
+
+child = """
+import sys, time, json
+sys.path[:0] = [{benchmarkDir!r}, {kakiDir!r}]
+import flpianoroll
+path, eager = {path!r}, {eager!r}
+t0 = time.perf_counter()
+if eager:
+  import kaki
+  for name in kaki.__all__:
+    getattr(kaki, name)
+g = {{'__name__': 'script'}}
+if path is None:
+  import kaki
+else:
+  with open(path, encoding='utf-8') as f:
+    exec(compile(f.read(), path, 'exec'), g)
+t1 = time.perf_counter()
+if path is not None:
+  g['apply'](g['createDialog']())
+t2 = time.perf_counter()
+print(json.dumps({{
+  'load': t1 - t0,
+  'preview': t2 - t1,
+  'modules': sorted(m for m in sys.modules if m.startswith('kaki')),
+}}))
+"""
+
+def measure(path: str | None, eager: bool) -> dict:
+  """Runs a script (or just `import kaki` for None) once in a fresh interpreter."""
+  code = child.format(benchmarkDir=benchmarkDir, kakiDir=kakiDir, path=path, eager=eager)
+  out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=kakiDir)
+  return json.loads(out.stdout.splitlines()[-1])
+
+def main():
+  parser = argparse.ArgumentParser(description='Measures how long kaki scripts take to load and show their first preview.')
+  parser.add_argument('scripts', nargs='*', help='scripts to run (default: all kaki scripts)')
+  parser.add_argument('--runs', type=int, default=10, help='runs per script and mode, the median is reported')
+  args = parser.parse_args()
+
+  scripts = args.scripts or sorted(f for f in os.listdir(kakiDir) if f.endswith('.pyscript'))
+  targets = [('import kaki', None)] + [(s, os.path.join(kakiDir, s)) for s in scripts]
+
+  print(f"{'':36} {'lazy (ms)':>24} {'eager (ms)':>24}")
+  print(f"{'script':36} {'load':>7} {'preview':>8} {'total':>7} {'load':>7} {'preview':>8} {'total':>7}  modules")
+  for name, path in targets:
+    row = []
+    modules = {}
+    for eager in (False, True):
+      runs = [measure(path, eager) for _ in range(args.runs)]
+      load = statistics.median(r['load'] for r in runs) * 1000
+      preview = statistics.median(r['preview'] for r in runs) * 1000
+      total = statistics.median((r['load'] + r['preview']) for r in runs) * 1000
+      row += [load, preview, total]
+      modules[eager] = len(runs[0]['modules'])
+    print(f"{name:36} " + ' '.join(f"{v:{8 if i % 3 == 1 else 7}.1f}" for i, v in enumerate(row)) + f"  {modules[False]}/{modules[True]}")
+
+if __name__ == '__main__':
+  main()
\ No newline at end of file
@@ -0,0 +1,290 @@
+"""
+Benchmark and profiling harness for the kaki pipeline.
+
+Runs canonical inputs through the same stages as the kaki scripts, against the stand-in flpianoroll module, and times
+every stage on its own:
+- parse: create the mesh (built-in shapes) or parse the path (SVG icons), bypassing the caches
+- transform: model transform, (normals,) projection and perspective division
+- light: per vertex lighting (meshes only)
+- rasterize: draw onto a buffer
+- fog: depth fog
+- resolve: downsampling of the oversampled buffer
+- render: conversion into notes
+Inputs are all built-in shapes at all sides (3 to 24) and a set of SVG icons, each at oversampling 0 to 2, with every
+available raster backend.
+
+Reported per case: time per stage (fastest of all repeats), rasterized samples per second (in thousands), allocated
+objects (memory blocks still held by the results: mesh/figure, buffers, notes) and the number of notes.
+
+Usage: python pipeline.py [--backend python numpy parallel] [--oversample 0 1 2] [--sides 3 8 24] [--filter TEXT]
+  [--repeat N] [--save FILE] [--compare FILE] [--profile FILE]
+All cases with both backends take a few minutes, narrow them down with --sides, --oversample or --filter. Times under
+--profile include the profiler's overhead.
+
+Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+
+benchmarkDir = os.path.dirname(os.path.abspath(__file__))
+kakiDir = os.path.dirname(benchmarkDir)
+# stand-in flpianoroll first
+sys.path[:0] = [benchmarkDir, kakiDir]
+
+import flpianoroll
+import kaki
+import kakiparsers
+
+STAGES = ('parse', 'transform', 'light', 'rasterize', 'fog', 'resolve', 'render')
+
+SHAPES = {
+  'Cube': lambda pheno, sides: kaki.createCube(pheno),
+  'Prism': lambda pheno, sides: kaki.createPrism(pheno, sides),
+  'Pyramid': lambda pheno, sides: kaki.createPrism(pheno, sides, 0),
+  'Pyramid frustum': lambda pheno, sides: kaki.createPrism(pheno, sides, 0.5),
+  'Sphere': lambda pheno, sides: kaki.createSphere(pheno, sides),
+  'Cylinder': lambda pheno, sides: kaki.createCylinder(pheno, sides),
+  'Cone': lambda pheno, sides: kaki.createCylinder(pheno, sides, 0),
+  'Cone frustum': lambda pheno, sides: kaki.createCylinder(pheno, sides, 0.5),
+  'Torus': lambda pheno, sides: kaki.createTorus(pheno, sides, 0.5),
+  'Star': lambda pheno, sides: kaki.createStar(pheno, sides, 0.5),
+}
+"built-in shapes (shape function called with material and sides)"
+
+ICONS = {
+  'triangle': 'm-16,-16 16,32 16,-16',
+  'frame': 'M10 10 L90 10 L90 90 L10 90 Z M30 30 L70 30 L70 70 L30 70 Z',
+  'star': 'M50 0 L61 35 L98 35 L68 57 L79 91 L50 70 L21 91 L32 57 L2 35 L39 35 Z',
+  'heart': 'M12 21.35l-1.45-1.32C5.4 15.36 2 12.28 2 8.5 2 5.42 4.42 3 7.5 3c1.74 0 3.41.81 4.5 2.09C13.09 3.81 14.76 3 16.5 3 19.58 3 22 5.42 22 8.5c0 3.78-3.4 6.86-8.55 11.54L12 21.35z',
+  'ring': 'M50 0 A50 50 0 1 1 50 100 A50 50 0 1 1 50 0 Z M50 20 A30 30 0 1 0 50 80 A30 30 0 1 0 50 20 Z',
+  'wave': 'M10 80 C 40 10, 65 10, 95 80 S 150 150, 180 80 Z',
+  'hills': 'M10 10 Q 50 90 90 10 T 170 10 Z',
+  'arcs': 'M 10 315 L 110 215 A 30 50 0 0 1 162.55 162.45 L 172.55 152.45 A 30 50 -45 0 1 215.1 109.9 L 315 10 Z',
+  'note': 'M9 3v10.55A4 4 0 1 0 11 17V7h4V3H9z',
+}
+"SVG icon paths"
+
+BACKENDS = ('python', 'numpy', 'parallel')
+"raster backends: pure Python, NumPy, pure Python in a process pool"
+
+def setBackend(backend: str):
+  """Configures kaki for a raster backend."""
+  kaki.config.use_numpy = backend == 'numpy'
+  kaki.config.use_parallel = backend == 'parallel'
+  kaki.config.parallel_min_samples = 0
+
+def backendAvailable(backend: str) -> bool:
+  """Tells whether a raster backend can be used here."""
+  if backend == 'numpy':
+    try:
+      import kakinumpy
+    except ImportError:
+      return False
+  return True
+
+class Timer:
+  """Adds up the time spent per stage."""
+  def __init__(self):
+    self.times = dict.fromkeys(STAGES, 0.0)
+    "seconds per stage"
+    self.stage = None
+    self.start = 0.0
+
+  def begin(self, stage: str):
+    self.stage = stage
+    self.start = time.perf_counter()
+
+  def end(self):
+    self.times[self.stage] += time.perf_counter() - self.start
+
+def runShape(timer: Timer, name: str, sides: int, optOversample: int):
+  """Runs a built-in shape through the pipeline of 'Draw 3D shape'. Returns everything that was created."""
+  pheno = kaki.phenotype()
+  lightPheno = kaki.phenotype(vel=1.0, col=8)
+  light = kaki.vec4(-0.5, -0.5, -0.7)
+
+  timer.begin('parse')
+  mesh = SHAPES[name](pheno, sides)
+  timer.end()
+
+  timer.begin('transform')
+  points = kaki.PointArray.fromMesh(mesh)
+  points.transform(kaki.TransformBuilder().scale(40, 40, 40).rotateZ(0.3).rotateY(0.6).rotateX(0.4).build())
+  points.writeMesh(mesh)
+  kaki.updateNormalsMesh(mesh)
+  timer.end()
+
+  timer.begin('light')
+  kaki.lightMesh(mesh, light, lightPheno, 0.3)
+  timer.end()
+
+  timer.begin('transform')
+  points.transform(kaki.TransformBuilder().translate(0, 0, -64).perspectiveTransform(0.012).translate(64, 64, 0).build())
+  points.perspectiveDivide()
+  points.writeMesh(mesh)
+  bbox = points.getBoundingBox(True)
+  kaki.limitBox(bbox, kaki.box(0, 0, 1024, 132))
+  timer.end()
+
+  timer.begin('rasterize')
+  buffer = kaki.Buffer(bbox.x1 - bbox.x0, bbox.y1 - bbox.y0, optOversample, True)
+  buffer.setOrigin(bbox.x0, bbox.y0)
+  kaki.drawMesh(buffer, mesh)
+  timer.end()
+
+  return mesh, bbox, buffer, *postProcess(timer, buffer, bbox)
+
+def runIcon(timer: Timer, name: str, optOversample: int):
+  """Runs an SVG icon through the pipeline of 'Draw SVG path'. Returns everything that was created."""
+  fill = kaki.phenotype()
+
+  timer.begin('parse')
+  kakiparsers.figureCache.clear()
+  figure = kaki.parseNormalizedFigureFromSvgPath(ICONS[name], 2 ** -(optOversample + 3), asArray=True)
+  timer.end()
+
+  timer.begin('transform')
+  figure.transform(kaki.TransformBuilder().scale(0.5, -0.5).rotateY(0.4).translate(0, 0, -64)
+    .perspectiveTransform(0.012).translate(64, 64, 0).build())
+  figure.perspectiveDivide()
+  bbox = figure.getBoundingBox(True)
+  kaki.limitBox(bbox, kaki.box(0, 0, 1024, 132))
+  timer.end()
+
+  timer.begin('rasterize')
+  buffer = kaki.Buffer(bbox.x1 - bbox.x0, bbox.y1 - bbox.y0, optOversample, True)
+  buffer.setOrigin(bbox.x0, bbox.y0)
+  kaki.drawFigure(buffer, figure, fill, 1)
+  timer.end()
+
+  return figure, bbox, buffer, *postProcess(timer, buffer, bbox)
+
+def postProcess(timer: Timer, buffer: kaki.Buffer, bbox: kaki.box) -> tuple:
+  """Fogs, resolves and renders a buffer. Returns the resolved buffer and the notes."""
+  timer.begin('fog')
+  buffer.fog(0, -80)
+  timer.end()
+
+  timer.begin('resolve')
+  resolved = buffer.resolve()
+  timer.end()
+
+  timer.begin('render')
+  notes = kaki.render(resolved, bbox.x0, bbox.y0)
+  timer.end()
+
+  return resolved, notes
+
+def runCase(kind: str, name: str, sides: int, optOversample: int, repeat: int) -> dict:
+  """Runs a case `repeat` times. Returns the fastest time per stage and the metrics of the first run."""
+  best = None
+  result = None
+  for r in range(repeat):
+    timer = Timer()
+    blocks = sys.getallocatedblocks()
+    if kind == 'shape':
+      created = runShape(timer, name, sides, optOversample)
+    else:
+      created = runIcon(timer, name, optOversample)
+    if result is None:
+      buffer = created[2]
+      result = {
+        'samples': buffer.size,
+        'objects': sys.getallocatedblocks() - blocks,
+        'notes': len(created[-1]),
+      }
+    del created
+    best = timer.times if best is None else {s: min(best[s], timer.times[s]) for s in STAGES}
+  result['times'] = best
+  result['total'] = sum(best.values())
+  return result
+
+def listCases(args) -> list[tuple[str, str, str, int, int]]:
+  """Returns (label, kind, name, sides, oversampling) of all selected cases."""
+  cases = []
+  for optOversample in args.oversample:
+    for name in SHAPES:
+      for sides in ([0] if name == 'Cube' else args.sides):
+        label = name if name == 'Cube' else f"{name} {sides}"
+        cases.append((f"{label} @{optOversample}", 'shape', name, sides, optOversample))
+    for name in ICONS:
+      cases.append((f"svg {name} @{optOversample}", 'icon', name, 0, optOversample))
+  if args.filter:
+    cases = [c for c in cases if args.filter.lower() in c[0].lower()]
+  return cases
+
+def main():
+  parser = argparse.ArgumentParser(description='Times every stage of the kaki pipeline for canonical inputs.')
+  parser.add_argument('--backend', nargs='+', choices=BACKENDS, default=['python', 'numpy'], help='raster backends to compare')
+  parser.add_argument('--oversample', nargs='+', type=int, choices=(0, 1, 2), default=[0, 1, 2], help='oversampling levels')
+  parser.add_argument('--sides', nargs='+', type=int, default=list(range(3, 25)), help='sides of the built-in shapes')
+  parser.add_argument('--filter', help='only run cases whose label contains this text')
+  parser.add_argument('--repeat', type=int, default=3, help='runs per case, the fastest is reported')
+  parser.add_argument('--save', help='write the results to a JSON file')
+  parser.add_argument('--compare', help='compare against results written by --save, flag cases that got slower')
+  parser.add_argument('--profile', help='run everything under cProfile and write the stats to this file')
+  parser.add_argument('--quiet', action='store_true', help='only print the summary')
+  args = parser.parse_args()
+
+  cases = listCases(args)
+  backends = [b for b in args.backend if backendAvailable(b)]
+  for b in args.backend:
+    if b not in backends:
+      print(f"backend '{b}' not available, skipped")
+  baseline = None
+  if args.compare:
+    with open(args.compare, encoding='utf-8') as f:
+      baseline = json.load(f)
+
+  profiler = cProfile.Profile() if args.profile else None
+  results: dict[str, dict] = {}
+  header = f"{'case':26} {'backend':8} " + ' '.join(f"{s[:9]:>9}" for s in STAGES) + f" {'total':>9} {'ksmp/s':>7} {'objects':>8} {'notes':>6}"
+  if not args.quiet:
+    print('times in ms')
+    print(header)
+  for backend in backends:
+    setBackend(backend)
+    for label, kind, name, sides, optOversample in cases:
+      if profiler is not None:
+        profiler.enable()
+      res = runCase(kind, name, sides, optOversample, args.repeat)
+      if profiler is not None:
+        profiler.disable()
+      key = f"{backend}: {label}"
+      results[key] = res
+      if args.quiet: continue
+      rate = res['samples'] / res['times']['rasterize'] / 1e3 if res['times']['rasterize'] > 0 else 0
+      line = (f"{label:26} {backend:8} " + ' '.join(f"{res['times'][s] * 1000:9.2f}" for s in STAGES)
+        + f" {res['total'] * 1000:9.2f} {rate:7.1f} {res['objects']:8} {res['notes']:6}")
+      if baseline is not None and key in baseline:
+        ratio = res['total'] / baseline[key]['total']
+        line += f"  x{ratio:.2f}" + ('  SLOWER' if ratio > 1.2 else '')
+      print(line)
+
+  # summary: time per stage, summed over all cases
+  print()
+  print(f"{'all cases':26} {'backend':8} " + ' '.join(f"{s[:9]:>9}" for s in STAGES) + f" {'total':>9} {'ksmp/s':>7} {'objects':>8} {'notes':>6}")
+  for backend in backends:
+    rs = [r for k, r in results.items() if k.startswith(backend + ':')]
+    times = {s: sum(r['times'][s] for r in rs) for s in STAGES}
+    rasterize = times['rasterize']
+    rate = sum(r['samples'] for r in rs) / rasterize / 1e3 if rasterize > 0 else 0
+    print(f"{len(rs):>3} cases{'':18} {backend:8} " + ' '.join(f"{times[s] * 1000:9.1f}" for s in STAGES)
+      + f" {sum(times.values()) * 1000:9.1f} {rate:7.1f} {sum(r['objects'] for r in rs):8} {sum(r['notes'] for r in rs):6}")
+
+  if args.save:
+    with open(args.save, 'w', encoding='utf-8') as f:
+      json.dump(results, f, indent=1)
+  if profiler is not None:
+    profiler.dump_stats(args.profile)
+    print()
+    pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+
+if __name__ == '__main__':
+  main()
\ No newline at end of file
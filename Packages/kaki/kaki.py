@@ -18,86 +18,231 @@ Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
 
 # perspective projection has to be applied explicitly before rendering
 
-from kakibuffer import Buffer
+# submodules are only imported once one of their names is used (scripts are re-imported whenever their dialog opens,
+# and most of them only need a fraction of the engine)
 
-import kakiconfig as config
+import importlib
 
-from kakigeometryutils import (
-  getFigureBoundingBox,
-  getMeshBoundingBox,
-  getPointsPlane,
-  getFigurePlane,
-  transformPoints,
-  transformFigure,
-  transformMesh,
-  clonePoints,
-  cloneFigure,
-  cloneMesh,
-  perspectiveDividePoints,
-  perspectiveDivideFigure,
-  perspectiveDivideMesh,
-  updateNormalsMesh,
-)
-
-from kakilighting import (
-  lightMesh
-)
-
-from kakiparsers import (
-  parsePhenotypeFromStyle,
-  serializePhenotypeToStyle,
-  parseFigureFromSvgPath,
-)
-
-from kakiprimitives import (
-  vec4,
-  mat4,
-  box,
-  figure,
-  phenotype,
-  tri,
-  mesh,
-)
-
-from kakirasterizer import (
-  drawFigure,
-  drawTriangle,
-  drawMesh,
-)
-
-from kakirenderer import render
-
-from kakishapes3d import (
-  createCube,
-  createPrism,
-  createSphere,
-  createCylinder,
-  createTorus,
-  createStar,
-)
-
-from kakiutils import (
-  getBoundingBox,
-  limitBox,
-  copyPhenotype,
-  mixPhenotypes,
-  interpolatePhenotypes,
-  getPhenotypeFromNote,
-  copyVec,
-  vecadd,
-  vecnorm,
-  dotprod,
-  crossprod,
-  vecangle,
-  matmul4,
-  transform,
-  identity4,
-  translate,
-  scale,
-  rotate,
-  rotateX,
-  rotateY,
-  rotateZ,
-  perspectiveTransform,
-)
+import kakiconfig as config
 
+exports: dict[str, tuple[str, ...]] = {
+  'kakibuffer': ('Buffer',),
+  'kakigbuffer': ('GBuffer',),
+  'kakigeometryarrays': ('PointArray', 'FigureArray'),
+  'kakigeometryutils': (
+    'getFigureBoundingBox',
+    'getMeshBoundingBox',
+    'getPointsPlane',
+    'getFigurePlane',
+    'transformPoints',
+    'transformFigure',
+    'transformMesh',
+    'clonePoints',
+    'cloneFigure',
+    'cloneMesh',
+    'cloneMeshShared',
+    'linkPoints',
+    'weldMesh',
+    'perspectiveDividePoints',
+    'perspectiveDivideFigure',
+    'perspectiveDivideMesh',
+    'updateNormalsMesh',
+  ),
+  'kakilighting': ('lightMesh',),
+  'kakipalette': (
+    'Palette',
+    'PaletteBuffer',
+    'quantizePhenotype',
+    'dequantizePhenotype',
+    'mixQuantized',
+  ),
+  'kakiparsers': (
+    'parsePhenotypeFromStyle',
+    'serializePhenotypeToStyle',
+    'parseFigureFromSvgPath',
+    'parseNormalizedFigureFromSvgPath',
+  ),
+  'kakiprimitives': (
+    'vec4',
+    'mat4',
+    'box',
+    'figure',
+    'phenotype',
+    'tri',
+    'mesh',
+  ),
+  'kakirasterizer': (
+    'drawFigure',
+    'drawTriangle',
+    'drawMesh',
+    'drawTriangleDeferred',
+    'drawMeshDeferred',
+    'setupMesh',
+    'MeshStats',
+  ),
+  'kakirenderer': ('render',),
+  'kakirendercache': ('RenderCache',),
+  'kakishapes3d': (
+    'cachedMesh',
+    'createCube',
+    'createPrism',
+    'createSphere',
+    'createCylinder',
+    'createTorus',
+    'createStar',
+  ),
+  'kakiutils': (
+    'getBoundingBox',
+    'limitBox',
+    'copyPhenotype',
+    'mixPhenotypes',
+    'interpolatePhenotypes',
+    'getPhenotypeFromNote',
+    'copyVec',
+    'vecadd',
+    'vecnorm',
+    'dotprod',
+    'crossprod',
+    'vecangle',
+    'matmul4',
+    'transform',
+    'identity4',
+    'translate',
+    'scale',
+    'rotate',
+    'rotateX',
+    'rotateY',
+    'rotateZ',
+    'perspectiveTransform',
+    'TransformBuilder',
+  ),
+}
+"public names per submodule"
+
+origins: dict[str, str] = {name: module for module, names in exports.items() for name in names}
+"submodule per public name"
+
+__all__ = ['config', *origins]
+
+def __getattr__(name: str):
+  """Imports a public name from its submodule on first use (and keeps it, so this is only called once per name)."""
+  module = origins.get(name)
+  if module is None:
+    raise AttributeError(f"module 'kaki' has no attribute '{name}'")
+  value = getattr(importlib.import_module(module), name)
+  globals()[name] = value
+  return value
+
+def __dir__() -> list[str]:
+  return sorted({*globals(), *origins})
+
+# same names, imported eagerly, for type checkers and editors only
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+  from kakibuffer import Buffer
+
+  from kakigbuffer import GBuffer
+
+  from kakigeometryarrays import (
+    PointArray,
+    FigureArray,
+  )
+
+  from kakigeometryutils import (
+    getFigureBoundingBox,
+    getMeshBoundingBox,
+    getPointsPlane,
+    getFigurePlane,
+    transformPoints,
+    transformFigure,
+    transformMesh,
+    clonePoints,
+    cloneFigure,
+    cloneMesh,
+    cloneMeshShared,
+    linkPoints,
+    weldMesh,
+    perspectiveDividePoints,
+    perspectiveDivideFigure,
+    perspectiveDivideMesh,
+    updateNormalsMesh,
+  )
+
+  from kakilighting import (
+    lightMesh
+  )
+
+  from kakipalette import (
+    Palette,
+    PaletteBuffer,
+    quantizePhenotype,
+    dequantizePhenotype,
+    mixQuantized,
+  )
+
+  from kakiparsers import (
+    parsePhenotypeFromStyle,
+    serializePhenotypeToStyle,
+    parseFigureFromSvgPath,
+    parseNormalizedFigureFromSvgPath,
+  )
+
+  from kakiprimitives import (
+    vec4,
+    mat4,
+    box,
+    figure,
+    phenotype,
+    tri,
+    mesh,
+  )
+
+  from kakirasterizer import (
+    drawFigure,
+    drawTriangle,
+    drawMesh,
+    drawTriangleDeferred,
+    drawMeshDeferred,
+    setupMesh,
+    MeshStats,
+  )
+
+  from kakirenderer import render
+
+  from kakirendercache import RenderCache
+
+  from kakishapes3d import (
+    cachedMesh,
+    createCube,
+    createPrism,
+    createSphere,
+    createCylinder,
+    createTorus,
+    createStar,
+  )
+
+  from kakiutils import (
+    getBoundingBox,
+    limitBox,
+    copyPhenotype,
+    mixPhenotypes,
+    interpolatePhenotypes,
+    getPhenotypeFromNote,
+    copyVec,
+    vecadd,
+    vecnorm,
+    dotprod,
+    crossprod,
+    vecangle,
+    matmul4,
+    transform,
+    identity4,
+    translate,
+    scale,
+    rotate,
+    rotateX,
+    rotateY,
+    rotateZ,
+    perspectiveTransform,
+    TransformBuilder,
+  )
\ No newline at end of file
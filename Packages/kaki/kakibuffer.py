@@ -2,10 +2,32 @@
 Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
 """
 
+from array import array
+from operator import add
+
 from kakiprimitives import phenotype
-from kakiutils import mixPhenotypes
+
+import kakiconfig as config
+
+# optional NumPy backend, chosen at import time
+try:
+  import kakinumpy
+except ImportError:
+  kakinumpy = None
+
+ZEMPTY = float('-inf')
+"z value of samples nothing has been drawn to (farther away than anything)"
+
+CHANNELS = ('vel', 'pan', 'rel', 'pof', 'cut', 'res', 'col', 'opa')
+"phenotype channels, each one is stored in its own array"
 
 class Buffer:
+  """Pixel buffer, stored as struct of arrays.
+
+  Every phenotype channel lives in a flat `array('f')`, indexed by sample (`y * width * oversample + x`).
+  `cov` tells whether anything has been drawn to a sample, `zbuffer` holds the depth per sample
+  (`ZEMPTY` where nothing has been drawn).
+  """
   def __init__(self, width: int, height: int, optOversample: int = 0, optZBuffer: bool = False):
     self.width = width
     "width of buffer in pixels"
@@ -13,57 +35,196 @@ class Buffer:
     "height of buffer in pixels"
     self.oversample: int = 2 ** optOversample
     "how many pixel sub-divisions (per dimension), power of 2"
-    self.data: list[phenotype] = [None] * (width * self.oversample) * (height * self.oversample)
-    "pixel data, each pixel is described by one phenotype"
+    size = (width * self.oversample) * (height * self.oversample)
+    self.size = size
+    "number of samples"
+    self.cov = array('B', bytes(size))
+    "coverage, 1 if a sample has been drawn to, 0 if it's empty"
+    self.vel = array('f', bytes(4 * size))
+    "velocity per sample"
+    self.pan = array('f', bytes(4 * size))
+    "panning per sample"
+    self.rel = array('f', bytes(4 * size))
+    "release per sample"
+    self.pof = array('f', bytes(4 * size))
+    "pitch offset per sample"
+    self.cut = array('f', bytes(4 * size))
+    "fcut/modx per sample"
+    self.res = array('f', bytes(4 * size))
+    "fres/mody per sample"
+    self.col = array('f', bytes(4 * size))
+    "note color/MIDI channel per sample"
+    self.opa = array('f', bytes(4 * size))
+    "opacity per sample"
     self.originx = 0.0
     "buffer x offset"
     self.originy = 0.0
     "buffer y offset"
-    self.zbuffer: list[float] | None = None
-    "z buffer data, each pixel has one float z value"
+    self.zbuffer: array | None = None
+    "z buffer data, each sample has one z value (`ZEMPTY` if nothing has been drawn)"
     if optZBuffer:
-      self.zbuffer: list[float] = [None] * (width * self.oversample) * (height * self.oversample)
+      self.zbuffer = array('d', [ZEMPTY]) * size
+    self.resolved: Buffer | None = None
+    "cached result of `resolve`, reset whenever samples are changed"
 
   def setOrigin(self, x: float, y: float):
     """Sets the buffer's offset."""
     self.originx = x
     self.originy = y
 
+  def getSample(self, i: int) -> phenotype | None:
+    """Returns the phenotype of a single sample, or None if it's empty."""
+    if not self.cov[i]: return None
+    return phenotype(self.vel[i], self.pan[i], self.rel[i], self.pof[i], self.cut[i], self.res[i], self.col[i], self.opa[i])
+
+  def setSample(self, i: int, pheno: phenotype | None):
+    """Sets the phenotype of a single sample, None will clear it."""
+    self.resolved = None
+    if pheno is None:
+      self.cov[i] = 0
+      return
+    self.cov[i] = 1
+    self.vel[i] = pheno.vel
+    self.pan[i] = pheno.pan
+    self.rel[i] = pheno.rel
+    self.pof[i] = pheno.pof
+    self.cut[i] = pheno.cut
+    self.res[i] = pheno.res
+    self.col[i] = pheno.col
+    self.opa[i] = pheno.opa
+
+  def fillSpan(self, i0: int, i1: int, pheno: phenotype):
+    """Sets samples i0 (inclusive) to i1 (exclusive) to the same phenotype."""
+    n = i1 - i0
+    if n <= 0: return
+    self.resolved = None
+    self.cov[i0:i1] = array('B', [1]) * n
+    for channel in CHANNELS:
+      getattr(self, channel)[i0:i1] = array('f', [getattr(pheno, channel)]) * n
+
+  def copy(self) -> 'Buffer':
+    """Returns a copy of the buffer (samples, origin and z buffer)."""
+    clone = Buffer(0, 0)
+    clone.width = self.width
+    clone.height = self.height
+    clone.oversample = self.oversample
+    clone.size = self.size
+    clone.cov = array('B', self.cov)
+    for channel in CHANNELS:
+      setattr(clone, channel, array('f', getattr(self, channel)))
+    clone.originx = self.originx
+    clone.originy = self.originy
+    if self.zbuffer is not None:
+      clone.zbuffer = array('d', self.zbuffer)
+    clone.resolved = self.resolved
+    return clone
+
+  def fillCovered(self, pheno: phenotype):
+    """Sets all samples that have been drawn to the same phenotype.
+    Opacity is multiplied with the samples' opacity instead, so coverage (see `drawEdgesCoverage`) is kept.
+    """
+    self.resolved = None
+    cov = self.cov
+    covered = [i for i in range(self.size) if cov[i]]
+    for channel in CHANNELS[:-1]:
+      data = getattr(self, channel)
+      value = getattr(pheno, channel)
+      for i in covered:
+        data[i] = value
+    opa = self.opa
+    for i in covered:
+      opa[i] *= pheno.opa
+
   def fog(self, znear: float, zfar: float, cutfar: bool = True):
     if self.zbuffer is None: return
+    if kakinumpy is not None and config.use_numpy:
+      return kakinumpy.fog(self, znear, zfar, cutfar)
+    self.resolved = None
     dz = zfar - znear
-    # go through all pixels and apply depth fog
-    for i in range(len(self.data)):
-      d = self.data[i]
-      z = self.zbuffer[i]
-      if d is not None and z is not None:
+    cov = self.cov
+    vel = self.vel
+    zbuffer = self.zbuffer
+    # go through all samples and apply depth fog
+    for i in range(self.size):
+      if cov[i]:
+        z = zbuffer[i]
+        if z == ZEMPTY: continue
         if z < zfar:
           if cutfar:
-            self.data[i] = None
+            cov[i] = 0
           else:
-            d.vel = 0
+            vel[i] = 0
         elif z < znear:
-          d.vel *= 1 - (z - znear) / dz
+          vel[i] *= 1 - (z - znear) / dz
+
+  def resolve(self) -> 'Buffer':
+    """Downsamples the whole buffer into a buffer without oversampling.
+
+    Each pixel is the opacity weighted average of its samples (empty samples count as transparent), its opacity
+    the average opacity. This is the same result as mixing the samples pairwise with `mixPhenotypes`, computed
+    as a separable box filter over the channel arrays. The result is cached until the buffer is changed.
+    """
+    if self.oversample == 1: return self
+    if self.resolved is not None: return self.resolved
+
+    ovs = self.oversample
+    w = self.width
+    h = self.height
+    sw = w * ovs
+    cov = self.cov
+    covBytes = cov.tobytes()
+    opa = self.opa
+    n = ovs * ovs
+
+    resolved = Buffer(w, h)
+    resolved.setOrigin(self.originx, self.originy)
+
+    def boxSum(rows: list[list[float]]) -> list[float]:
+      # horizontal pass: sum up the samples of each pixel in every sample row ...
+      # ... vertical pass: sum up the sample rows
+      vsum = None
+      for values in rows:
+        hsum = values[0::ovs]
+        for sx in range(1, ovs):
+          hsum = list(map(add, hsum, values[sx::ovs]))
+        vsum = hsum if vsum is None else list(map(add, vsum, hsum))
+      return vsum
+
+    for y in range(h):
+      # only look at the pixels between the first and the last covered sample of the pixel row
+      rows = [(y * ovs + sy) * sw for sy in range(ovs)]
+      xa = w
+      xb = 0
+      for r in rows:
+        first = covBytes.find(1, r, r + sw)
+        if first >= 0:
+          xa = min(xa, (first - r) // ovs)
+          xb = max(xb, (covBytes.rfind(1, r, r + sw) - r) // ovs + 1)
+      if xa >= xb: continue
+      spans = [(r + xa * ovs, r + xb * ovs) for r in rows]
+
+      # empty samples don't weigh in
+      wgts = [[o if c else 0.0 for o, c in zip(opa[i0:i1], cov[i0:i1])] for i0, i1 in spans]
+      wgtSum = boxSum(wgts)
+      covSum = boxSum([list(cov[i0:i1]) for i0, i1 in spans])
+
+      j0 = y * w + xa
+      j1 = y * w + xb
+      resolved.cov[j0:j1] = array('B', [1 if c else 0 for c in covSum])
+      for channel in CHANNELS[:-1]:
+        data = getattr(self, channel)
+        weighted = boxSum([list(map(float.__mul__, wgt, data[i0:i1])) for wgt, (i0, i1) in zip(wgts, spans)])
+        getattr(resolved, channel)[j0:j1] = array('f', [s / t if t > 0 else 0.0 for s, t in zip(weighted, wgtSum)])
+      resolved.opa[j0:j1] = array('f', [t / n for t in wgtSum])
+
+    self.resolved = resolved
+    return resolved
 
   def getPhenotypeAt(self, x: int, y: int) -> phenotype:
-    """Returns the phenotype at given pixel location. Will perform interpolation in case of oversampling.
+    """Returns the phenotype at given pixel location. Will use the resolved buffer in case of oversampling.
     """
     if x < 0 or x >= self.width or y < 0 or y >= self.height: return None
 
     i = y * self.width + x
-    if self.oversample == 1: return self.data[i]
-
-    # build an intermediate buffer that starts with all data in the oversampling rect and gets downsampled recursively
-    data = []
-    for sy in range(self.oversample):
-      i0 = (y * self.oversample + sy) * self.width * self.oversample + x * self.oversample
-      i1 = i0 + self.oversample
-      data.extend(self.data[i0:i1])
-    # flattened out recursion
-    while len(data) > 1:
-      ndata = []
-      # mix neighbouring phenotypes
-      for i in range(0, len(data), 2):
-        ndata.append(mixPhenotypes(data[i], data[i+1]))
-      data = ndata
-    return data[0]
\ No newline at end of file
+    if self.oversample == 1: return self.getSample(i)
+    return self.resolve().getSample(i)
\ No newline at end of file
@@ -5,4 +5,14 @@ Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
 cull_frontface = True
 "frontface culling - if `False` front facing triangles won't be rendered"
 cull_backface = True
-"backface culling - if `False` back facing triangles won't be rendered"
\ No newline at end of file
+"backface culling - if `False` back facing triangles won't be rendered"
+use_numpy = True
+"NumPy backend - if `True` (and NumPy is available) triangles, figures and fog are computed as array operations"
+use_parallel = False
+"parallel rendering - if `True` large buffers are split into tiles that are rasterized in a process pool (needs a Python that can spawn worker processes, which FL Studio's doesn't)"
+parallel_min_samples = 1 << 18
+"parallel rendering is only used for buffers with at least this many samples (pixels times oversampling squared)"
+parallel_tile_size = 64
+"size of the tiles (in pixels) for parallel rendering"
+parallel_workers = None
+"number of worker processes for parallel rendering, `None` uses all cores"
\ No newline at end of file
@@ -0,0 +1,169 @@
+"""
+G-buffer for deferred shading.
+
+Instead of lit phenotypes, triangles only leave depth, normal and material ID per sample (see
+`kakirasterizer.drawMeshDeferred`). Lighting and fog are applied afterwards, once per visible sample.
+
+Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
+"""
+
+from array import array
+
+from kakibuffer import Buffer, ZEMPTY
+from kakiprimitives import vec4, phenotype
+from kakiutils import normalize
+
+import kakiconfig as config
+
+# optional NumPy backend, chosen at import time
+try:
+  import kakinumpy
+except ImportError:
+  kakinumpy = None
+
+class GBuffer:
+  """Geometry buffer, stored as struct of arrays (indexed by sample like `Buffer`).
+
+  `mat` holds the material ID per sample (-1 where nothing has been drawn), `nx`, `ny`, `nz` the (interpolated)
+  normal, `zbuffer` the depth.
+  """
+  def __init__(self, width: int, height: int, optOversample: int = 0):
+    self.width = width
+    "width of buffer in pixels"
+    self.height = height
+    "height of buffer in pixels"
+    self.oversample: int = 2 ** optOversample
+    "how many pixel sub-divisions (per dimension), power of 2"
+    size = (width * self.oversample) * (height * self.oversample)
+    self.size = size
+    "number of samples"
+    self.mat = array('h', [-1]) * size
+    "material ID per sample, -1 if it's empty"
+    self.nx = array('f', bytes(4 * size))
+    "normal x per sample"
+    self.ny = array('f', bytes(4 * size))
+    "normal y per sample"
+    self.nz = array('f', bytes(4 * size))
+    "normal z per sample"
+    self.zbuffer = array('d', [ZEMPTY]) * size
+    "z buffer data, each sample has one z value (`ZEMPTY` if nothing has been drawn)"
+    self.originx = 0.0
+    "buffer x offset"
+    self.originy = 0.0
+    "buffer y offset"
+    self.materials: list[phenotype] = []
+    "material phenotypes, indexed by material ID"
+    self.materialIds: dict[tuple, int] = {}
+    "material ID per phenotype (by value)"
+
+  def setOrigin(self, x: float, y: float):
+    """Sets the buffer's offset."""
+    self.originx = x
+    self.originy = y
+
+  def addMaterial(self, pheno: phenotype | None) -> int:
+    """Returns the material ID of a phenotype, registers it if it's new. None counts as transparent phenotype."""
+    if pheno is None:
+      pheno = phenotype(vel=0.0)
+    key = (pheno.vel, pheno.pan, pheno.rel, pheno.pof, pheno.cut, pheno.res, pheno.col, pheno.opa)
+    mid = self.materialIds.get(key)
+    if mid is None:
+      mid = len(self.materials)
+      self.materials.append(pheno)
+      self.materialIds[key] = mid
+    return mid
+
+  def shade(self, lightVector: vec4, lightPheno: phenotype, shininess: float = 0.0,
+      fogNear: float | None = None, fogFar: float | None = None, cutfar: bool = True) -> Buffer:
+    """Lights every drawn sample with its normal and material, then applies depth fog - all in one pass.
+
+    Lighting is the same as `kakilighting.lightMesh` and fog the same as `Buffer.fog`, just per sample instead of
+    per vertex.
+
+    Args:
+      lightVector (vec4): direction the light shines in
+      lightPheno (phenotype): light phenotype
+      shininess (float): shininess, 0 for plain diffuse light
+      fogNear (float | None): z from which on fog starts, None for no fog
+      fogFar (float | None): z at which samples disappear completely
+      cutfar (bool): if True, samples beyond fogFar are removed, otherwise made silent
+
+    Returns:
+      Buffer: shaded buffer (same size, origin and oversampling, with z buffer)
+    """
+    buffer = Buffer(self.width, self.height, self.oversample.bit_length() - 1, True)
+    buffer.setOrigin(self.originx, self.originy)
+    # invert the light vector, because normals need to be aligned in same direction IOT be lit
+    light = normalize(vec4(-lightVector.x, -lightVector.y, -lightVector.z))
+    fog = fogNear is not None and fogFar is not None
+
+    if kakinumpy is not None and config.use_numpy:
+      kakinumpy.shade(self, buffer, light, lightPheno, shininess, fogNear if fog else None, fogFar, cutfar)
+      return buffer
+
+    lx, ly, lz = light.x, light.y, light.z
+    shiny = shininess > 0
+    shinyDiv = pow(2, 10 * shininess) - 1
+    dz = fogFar - fogNear if fog else 0
+    materials = self.materials
+    lvel, lpan, lrel, lpof = lightPheno.vel, lightPheno.pan, lightPheno.rel, lightPheno.pof
+    lcut, lres, lcol = lightPheno.cut, lightPheno.res, lightPheno.col
+    mat = self.mat
+    nx, ny, nz = self.nx, self.ny, self.nz
+    zbuffer = self.zbuffer
+    cov = buffer.cov
+    bvel, bpan, brel, bpof = buffer.vel, buffer.pan, buffer.rel, buffer.pof
+    bcut, bres, bcol, bopa = buffer.cut, buffer.res, buffer.col, buffer.opa
+    bz = buffer.zbuffer
+
+    for i in range(self.size):
+      mid = mat[i]
+      if mid < 0: continue
+      z = zbuffer[i]
+      if fog and z < fogFar and cutfar: continue
+
+      # amount of lighting (normal is interpolated, so its length is <= 1)
+      nxi = nx[i]
+      nyi = ny[i]
+      nzi = nz[i]
+      norm = (nxi * nxi + nyi * nyi + nzi * nzi) ** 0.5
+      amt = 0 if norm == 0 else (nxi * lx + nyi * ly + nzi * lz) / norm
+      amt = min(max(amt, -1), 1)
+      if shiny:
+        sign = 1 if amt >= 0 else -1
+        amt = abs(amt)
+        amt = sign * (pow(2, 10 * shininess * amt) - 1) / shinyDiv
+
+      m = materials[mid]
+      if amt > 0:
+        # mix material phenotype with light, keep original opacity (for logical reasons)
+        inv = 1 - amt
+        vel = m.vel * inv + lvel * amt
+        bpan[i] = m.pan * inv + lpan * amt
+        brel[i] = m.rel * inv + lrel * amt
+        bpof[i] = m.pof * inv + lpof * amt
+        bcut[i] = m.cut * inv + lcut * amt
+        bres[i] = m.res * inv + lres * amt
+        bcol[i] = m.col * inv + lcol * amt
+      else:
+        # or shade
+        vel = m.vel * (amt + 1)
+        bpan[i] = m.pan
+        brel[i] = m.rel
+        bpof[i] = m.pof
+        bcut[i] = m.cut
+        bres[i] = m.res
+        bcol[i] = m.col
+
+      if fog:
+        if z < fogFar:
+          vel = 0
+        elif z < fogNear:
+          vel *= 1 - (z - fogNear) / dz
+
+      cov[i] = 1
+      bvel[i] = vel
+      bopa[i] = m.opa
+      bz[i] = z
+
+    return buffer
\ No newline at end of file
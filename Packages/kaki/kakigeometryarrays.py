@@ -0,0 +1,190 @@
+"""
+Geometry stored as flat coordinate arrays.
+
+Instead of one `vec4` per point, all coordinates live in a single `array('d')` (x, y, z, w per point).
+Transforms and the perspective division work on the array in place, without allocating any objects.
+
+Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
+"""
+
+import math
+from array import array
+
+from kakigeometryutils import getPointsPlane
+from kakiprimitives import vec4, mat4, box, figure, mesh
+from kakirasterutils import aetEdge
+
+import kakiconfig as config
+
+# optional NumPy backend, chosen at import time
+try:
+  import kakinumpy
+except ImportError:
+  kakinumpy = None
+
+class PointArray:
+  """List of points, stored as flat array of coordinates (x, y, z, w per point).
+  """
+  __slots__ = ['coords']
+
+  def __init__(self, coords: array | None = None):
+    self.coords = array('d') if coords is None else coords
+    "coordinates, 4 per point"
+
+  def __len__(self) -> int:
+    return len(self.coords) // 4
+
+  @classmethod
+  def fromPoints(cls, points: list[vec4]) -> 'PointArray':
+    """Returns the points of a list of vectors as PointArray."""
+    coords = array('d')
+    for p in points:
+      coords.extend((p.x, p.y, p.z, p.w))
+    return cls(coords)
+
+  @classmethod
+  def fromMesh(cls, mesh: mesh) -> 'PointArray':
+    """Returns the positions of a mesh as PointArray (for welded meshes every unique position once)."""
+    return cls.fromPoints(mesh.verts if mesh.points is None else mesh.points)
+
+  def copy(self) -> 'PointArray':
+    """Returns a copy."""
+    return PointArray(array('d', self.coords))
+
+  def getPoint(self, i: int) -> vec4:
+    """Returns point i as new vector."""
+    c = self.coords
+    j = 4 * i
+    return vec4(c[j], c[j + 1], c[j + 2], c[j + 3])
+
+  def toPoints(self) -> list[vec4]:
+    """Returns all points as new vectors."""
+    c = self.coords
+    return [vec4(c[j], c[j + 1], c[j + 2], c[j + 3]) for j in range(0, len(c), 4)]
+
+  def writePoints(self, points: list[vec4]) -> None:
+    """Writes the coordinates back into a list of vectors (in place, of same length)."""
+    c = self.coords
+    for j, p in zip(range(0, len(c), 4), points):
+      p.x = c[j]
+      p.y = c[j + 1]
+      p.z = c[j + 2]
+      p.w = c[j + 3]
+
+  def writeMesh(self, mesh: mesh) -> None:
+    """Writes the coordinates back into the mesh they were taken from (see `fromMesh`)."""
+    self.writePoints(mesh.verts if mesh.points is None else mesh.points)
+
+  def transform(self, t: mat4) -> None:
+    """Transforms all points in place (same result as `kakiutils.transform` per point)."""
+    if kakinumpy is not None and config.use_numpy:
+      return kakinumpy.transformCoords(self.coords, t)
+    c = self.coords
+    a11, a12, a13, a14 = t.a11, t.a12, t.a13, t.a14
+    a21, a22, a23, a24 = t.a21, t.a22, t.a23, t.a24
+    a31, a32, a33, a34 = t.a31, t.a32, t.a33, t.a34
+    a41, a42, a43, a44 = t.a41, t.a42, t.a43, t.a44
+    for j in range(0, len(c), 4):
+      x = c[j]
+      y = c[j + 1]
+      z = c[j + 2]
+      w = c[j + 3]
+      c[j] = a11 * x + a12 * y + a13 * z + a14 * w
+      c[j + 1] = a21 * x + a22 * y + a23 * z + a24 * w
+      c[j + 2] = a31 * x + a32 * y + a33 * z + a34 * w
+      c[j + 3] = a41 * x + a42 * y + a43 * z + a44 * w
+
+  def perspectiveDivide(self) -> None:
+    """Applies the perspective projection to all points in place (see `kakigeometryutils.perspectiveDividePoints`)."""
+    if kakinumpy is not None and config.use_numpy:
+      return kakinumpy.perspectiveDivideCoords(self.coords)
+    c = self.coords
+    for j in range(0, len(c), 4):
+      w = c[j + 3]
+      # undocumented safety feature: prevent division by 0
+      if w <= 1e-10:
+        w = 1e-10
+      c[j] /= w
+      c[j + 1] /= w
+      c[j + 2] /= w
+
+  def getBoundingBox(self, round: bool = False) -> box | None:
+    """Returns the smallest box that includes all points (see `kakiutils.getBoundingBox`)."""
+    c = self.coords
+    if len(c) == 0: return None
+    xs = c[0::4]
+    ys = c[1::4]
+    xmin = min(xs)
+    xmax = max(xs)
+    ymin = min(ys)
+    ymax = max(ys)
+    if round:
+      xmin = math.floor(xmin)
+      ymin = math.floor(ymin)
+      xmax = math.ceil(xmax)
+      ymax = math.ceil(ymax)
+    return box(xmin, ymin, xmax, ymax)
+
+class FigureArray(PointArray):
+  """Figure (list of polygons), stored as one flat array of coordinates.
+  Polygon i consists of the points `offsets[i]` (inclusive) to `offsets[i + 1]` (exclusive).
+  """
+  __slots__ = ['offsets']
+
+  def __init__(self, coords: array | None = None, offsets: array | None = None):
+    super().__init__(coords)
+    self.offsets = array('l', [0]) if offsets is None else offsets
+    "index of the first point per polygon, plus the total number of points"
+
+  @classmethod
+  def fromFigure(cls, figure: figure) -> 'FigureArray':
+    """Returns a figure as FigureArray."""
+    coords = array('d')
+    offsets = array('l', [0])
+    for polygon in figure:
+      for p in polygon:
+        coords.extend((p.x, p.y, p.z, p.w))
+      offsets.append(offsets[-1] + len(polygon))
+    return cls(coords, offsets)
+
+  def copy(self) -> 'FigureArray':
+    """Returns a copy."""
+    return FigureArray(array('d', self.coords), array('l', self.offsets))
+
+  def toFigure(self) -> figure:
+    """Returns the figure as lists of new vectors."""
+    c = self.coords
+    o = self.offsets
+    return [[vec4(c[j], c[j + 1], c[j + 2], c[j + 3]) for j in range(4 * o[i], 4 * o[i + 1], 4)] for i in range(len(o) - 1)]
+
+  def getPlane(self) -> vec4 | None:
+    """Returns the plane equation of the figure (assuming it's planar), see `kakigeometryutils.getFigurePlane`."""
+    c = self.coords
+    o = self.offsets
+    for i in range(len(o) - 1):
+      # points are only created until the plane is found
+      points = (vec4(c[j], c[j + 1], c[j + 2], c[j + 3]) for j in range(4 * o[i], 4 * o[i + 1], 4))
+      plane = getPointsPlane(points)
+      if plane is not None:
+        return plane
+
+  def getEdges(self) -> list[aetEdge]:
+    """Collects all non-horizontal edges, sorted by their lower y (see `kakirasterutils.aetBuildEdgeTable`)."""
+    c = self.coords
+    o = self.offsets
+    edges: list[aetEdge] = []
+
+    for i in range(len(o) - 1):
+      xs = c[4 * o[i]:4 * o[i + 1]:4]
+      ys = c[4 * o[i] + 1:4 * o[i + 1]:4]
+      for k in range(len(xs)):
+        x0 = xs[k-1] # -1 will address last item
+        y0 = ys[k-1]
+        dy = ys[k] - y0
+        if dy > 0:    # "upward" edge
+          edges.append((y0, ys[k], x0, y0, xs[k] - x0, dy, 1))
+        elif dy < 0:  # "downward" edge
+          edges.append((ys[k], y0, x0, y0, xs[k] - x0, dy, -1))
+
+    edges.sort(key=lambda e: e[0])
+    return edges
\ No newline at end of file
@@ -2,6 +2,8 @@
 Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
 """
 
+import math
+
 from kakiprimitives import vec4, mat4, box, figure, mesh
 from kakiutils import getBoundingBox, copyPhenotype, transform, vecnorm, dotprod, crossprod, vecadd
 
@@ -16,7 +18,7 @@ def getFigureBoundingBox(figure: figure, round: bool = False) -> box:
 def getMeshBoundingBox(mesh: mesh, round: bool = False) -> box:
   """Returns the bounding box of a mesh.
   """
-  return getBoundingBox(mesh.verts, round)
+  return getBoundingBox(mesh.verts if mesh.points is None else mesh.points, round)
 
 def getPointsPlane(points: list[vec4]) -> vec4 | None:
   """Returns the plane equation for a list of points
@@ -81,8 +83,13 @@ def transformFigure(figure: figure, t: mat4) -> None:
 
 def transformMesh(mesh: mesh, t: mat4) -> None:
   """Transforms a mesh in-place.
+  Welded meshes get every unique position transformed once.
   """
-  transformPoints(mesh.verts, t)
+  if mesh.points is None:
+    transformPoints(mesh.verts, t)
+    return
+  transformPoints(mesh.points, t)
+  linkPoints(mesh)
   # TODO: inverse transpose matrix
   # TODO: tn = inverseTranspose(t), transformPoints(mesh.normals, tn)
 
@@ -105,11 +112,106 @@ def cloneFigure(figure: figure) -> figure:
 def cloneMesh(msh: mesh) -> mesh:
   """Returns a clone of given mesh.
   """
-  clonedVerts = clonePoints(msh.verts)
   clonedTris = [tri.copy() for tri in msh.tris]
   clonedPhenos = [copyPhenotype(p) for p in msh.phenos]
 
-  return mesh(clonedVerts, clonedPhenos, clonedTris)
+  if msh.points is None:
+    return mesh(clonePoints(msh.verts), clonedPhenos, clonedTris)
+  clone = mesh([], clonedPhenos, clonedTris)
+  clone.points = clonePoints(msh.points)
+  clone.pointIndex = msh.pointIndex.copy()
+  linkPoints(clone)
+  return clone
+
+def cloneMeshShared(msh: mesh) -> mesh:
+  """Returns a cheap clone of given mesh: vertices are cloned, phenotypes and triangles are shared with the original.
+  Phenotypes of the clone must be replaced, not changed in place (copy-on-write).
+  """
+  if msh.points is None:
+    return mesh(clonePoints(msh.verts), list(msh.phenos), list(msh.tris))
+  clone = mesh([], list(msh.phenos), list(msh.tris))
+  clone.points = clonePoints(msh.points)
+  clone.pointIndex = msh.pointIndex
+  linkPoints(clone)
+  return clone
+
+def linkPoints(mesh: mesh) -> None:
+  """Points the vertices of a welded mesh to its (unique) positions again, e.g. after these have been replaced.
+  """
+  points = mesh.points
+  mesh.verts = [points[i] for i in mesh.pointIndex]
+  if len(mesh.normals) != len(mesh.verts):
+    mesh.normals = [vec4()] * len(mesh.verts)
+
+def weldMesh(msh: mesh, creaseAngle: float = 0.0, eps: float = 1e-9) -> mesh:
+  """Returns a welded copy of a mesh: vertices at the same position are merged, unless that would change the shading.
+
+  Vertices are only merged if they share position (within eps), phenotype, and their normals (see `updateNormalsMesh`)
+  are at most creaseAngle apart. With the default angle, hard edges stay hard: vertices are only split where normals
+  have to differ. Merged vertices share one vec4 in `points`, so transforms are done once per unique position,
+  lighting once per unique vertex.
+
+  Args:
+    msh (mesh): mesh to weld, isn't changed
+    creaseAngle (float): largest angle (in radians) between vertex normals that still get merged (i.e. smoothed)
+    eps (float): positions are compared after rounding to multiples of eps
+
+  Returns:
+    mesh: welded mesh
+  """
+  # vertex normals as they'd be calculated for lighting
+  normals = [vec4(0, 0, 0, 0) for v in msh.verts]
+  for tri in msh.tris:
+    normal = getPointsPlane([msh.verts[i] for i in tri])
+    if normal is None: continue
+    for i in tri:
+      normals[i] = vecadd(normals[i], normal)
+  for normal in normals:
+    norm = vecnorm(normal)
+    if norm > 0:
+      normal.x /= norm
+      normal.y /= norm
+      normal.z /= norm
+  # a tiny tolerance, so float noise doesn't split vertices
+  minCos = math.cos(max(creaseAngle, 1e-6))
+
+  points: list[vec4] = []
+  pointIndex: list[int] = []
+  phenos = []
+  pointKeys: dict[tuple, int] = {}
+  # per point: list of (vertex index, normal, phenotype key) of its merged vertices
+  pointVerts: list[list[tuple[int, vec4, tuple]]] = []
+  remap: list[int] = []
+  for i, v in enumerate(msh.verts):
+    key = (round(v.x / eps), round(v.y / eps), round(v.z / eps), round(v.w / eps))
+    ip = pointKeys.get(key)
+    if ip is None:
+      ip = len(points)
+      pointKeys[key] = ip
+      points.append(vec4(v.x, v.y, v.z, v.w))
+      pointVerts.append([])
+    pheno = msh.phenos[i]
+    phenoKey = None if pheno is None else (pheno.vel, pheno.pan, pheno.rel, pheno.pof, pheno.cut, pheno.res, pheno.col, pheno.opa)
+    normal = normals[i]
+    zero = normal.x == 0 and normal.y == 0 and normal.z == 0
+    for j, n, k in pointVerts[ip]:
+      if k != phenoKey: continue
+      nzero = n.x == 0 and n.y == 0 and n.z == 0
+      if (zero and nzero) or (not zero and not nzero and dotprod(normal, n) >= minCos):
+        remap.append(j)
+        break
+    else:
+      j = len(pointIndex)
+      pointIndex.append(ip)
+      phenos.append(pheno)
+      pointVerts[ip].append((j, normal, phenoKey))
+      remap.append(j)
+
+  welded = mesh([], phenos, [[remap[i] for i in tri] for tri in msh.tris])
+  welded.points = points
+  welded.pointIndex = pointIndex
+  linkPoints(welded)
+  return welded
 
 def perspectiveDividePoints(points: list[vec4]) -> None:
   """Applies the perspective projection to a list of points.
@@ -132,7 +234,8 @@ def perspectiveDivideFigure(figure: figure) -> None:
 def perspectiveDivideMesh(mesh: mesh) -> None:
   """Applies the perspective projection to a mesh.
   """
-  perspectiveDividePoints(mesh.verts)
+  # vertices of a welded mesh share their vec4s, divide each one only once
+  perspectiveDividePoints(mesh.verts if mesh.points is None else mesh.points)
 
 def updateNormalsMesh(mesh: mesh) -> None:
   """Updates the normal vectors in a mesh based on these simple rules
@@ -3,7 +3,7 @@ Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
 """
 
 from kakiprimitives import vec4, phenotype, mesh
-from kakiutils import vecnorm, normalize, dotprod, interpolatePhenotypes
+from kakiutils import vecnorm, normalize, dotprod, copyPhenotype, interpolatePhenotypes
 
 def lightMesh(mesh: mesh, lightVector: vec4, lightPheno: phenotype, shininess: float = 0.0):
   """Lights a mesh in place.
@@ -27,5 +27,7 @@ def lightMesh(mesh: mesh, lightVector: vec4, lightPheno: phenotype, shininess: f
       mesh.phenos[i] = interpolatePhenotypes([matPheno, lightPheno], [1 - amt, amt])
       mesh.phenos[i].opa = matPheno.opa
     elif amt < 0:
-      # or shade
-      mesh.phenos[i].vel *= (amt + 1)
+      # or shade (on a copy, phenotypes may be shared between vertices or meshes)
+      pheno = copyPhenotype(mesh.phenos[i])
+      pheno.vel *= (amt + 1)
+      mesh.phenos[i] = pheno
@@ -0,0 +1,277 @@
+"""
+NumPy raster backend. Importing this module fails if NumPy isn't available,
+in which case kaki sticks to its pure Python code.
+
+Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
+"""
+
+import math
+
+import numpy as np
+
+import kakibuffer
+from kakiprimitives import vec4, mat4, phenotype
+from kakirasterutils import aetEdge
+from kakiutils import getBoundingBox
+
+import kakiconfig as config
+
+def bufferViews(buffer) -> dict[str, np.ndarray]:
+  """Returns writable NumPy views on a buffer's sample arrays (no copies)."""
+  views = {
+    'cov': np.frombuffer(buffer.cov, dtype=np.uint8),
+  }
+  for channel in kakibuffer.CHANNELS:
+    views[channel] = np.frombuffer(getattr(buffer, channel), dtype=np.float32)
+  if buffer.zbuffer is not None:
+    views['z'] = np.frombuffer(buffer.zbuffer, dtype=np.float64)
+  return views
+
+def drawEdges(buffer, edges: list[aetEdge], fill: phenotype, fillRule: int = 0, plane: vec4 | None = None):
+  """Fills the area enclosed by the edges of a figure onto buffer, see `kakirasterizer.drawEdges`.
+
+  Inclusion is tested for blocks of scanlines at once: the crossings of all edges with all scanlines of a block
+  are computed in one go, each sample then counts the crossings to its right by binary search.
+  """
+  buffer.resolved = None
+
+  ovs = buffer.oversample
+  ox = buffer.originx
+  oy = buffer.originy
+  sw = buffer.width * ovs
+  sh = buffer.height * ovs
+  if sw == 0 or sh == 0: return
+
+  if len(edges) == 0: return
+  ylo, yhi, ex0, ey0, edx, edy, edir = (np.array(c, dtype=np.float64) for c in zip(*edges))
+  # even-odd counts crossings, nonzero sums up their directions
+  weight = np.ones_like(edir) if fillRule == 0 else edir
+
+  views = bufferViews(buffer)
+  px = np.arange(sw) / ovs + ox
+
+  # keep blocks at around a million crossings
+  block = max(1, (1 << 20) // len(edges))
+  for by in range(0, sh, block):
+    ys = np.arange(by, min(by + block, sh))
+    py = (ys / ovs + oy)[:, None]
+    active = (ylo <= py) & (yhi > py)
+    rows = np.flatnonzero(active.any(axis=1))
+    if len(rows) == 0: continue
+    # inactive edges cross at -inf, so they're never to the right of a sample
+    cx = np.where(active, ex0 + (py - ey0) / edy * edx, -np.inf)
+    order = np.argsort(cx, axis=1)
+    cx = np.take_along_axis(cx, order, axis=1)
+    w = np.take_along_axis(np.where(active, weight, 0.0), order, axis=1)
+    prefix = np.concatenate([np.zeros((len(ys), 1)), np.cumsum(w, axis=1)], axis=1)
+
+    for r in rows:
+      # sum of crossings with cx > px
+      n = prefix[r, -1] - prefix[r, np.searchsorted(cx[r], px, side='right')]
+      inside = n % 2 != 0 if fillRule == 0 else n != 0
+      xs = np.flatnonzero(inside)
+      if len(xs) == 0: continue
+      idx = ys[r] * sw + xs
+      if plane is not None and buffer.zbuffer is not None:
+        znew = (plane.w - plane.x * px[xs] - plane.y * py[r, 0]) / plane.z
+        closer = znew > views['z'][idx]
+        idx = idx[closer]
+        views['z'][idx] = znew[closer]
+      views['cov'][idx] = 1
+      for channel in kakibuffer.CHANNELS:
+        views[channel][idx] = getattr(fill, channel)
+
+def drawTriangle(buffer, verts: list[vec4], phenos: list[phenotype]):
+  """Draws a triangle onto buffer, see `kakirasterizer.drawTriangle`.
+
+  Edge functions, barycentric weights, the depth test and the phenotype interpolation are evaluated for the
+  whole bounding box at once.
+  """
+  buffer.resolved = None
+
+  # minimize and clip rect to render in
+  bbox = getBoundingBox(verts)
+  x0 = max(0, math.floor(bbox.x0 - buffer.originx))
+  y0 = max(0, math.floor(bbox.y0 - buffer.originy))
+  x1 = min(buffer.width, math.ceil(bbox.x1 - buffer.originx))
+  y1 = min(buffer.height, math.ceil(bbox.y1 - buffer.originy))
+  if x0 >= x1 or y0 >= y1: return
+
+  ovs = buffer.oversample
+  ox = buffer.originx
+  oy = buffer.originy
+  sw = buffer.width * ovs
+  p0, p1, p2 = verts
+  e123 = (p1.x - p0.x) * (p2.y - p0.y) - (p1.y - p0.y) * (p2.x - p0.x)
+
+  # nothing to do if the triangle has no area
+  if e123 == 0: return
+
+  # all covered samples share the orientation of the triangle, so culling can be decided once
+  if e123 < 0 and not config.cull_backface: return
+  if e123 > 0 and not config.cull_frontface: return
+  sgn = 1 if e123 > 0 else -1
+
+  xs = np.arange(x0 * ovs, x1 * ovs)
+  ys = np.arange(y0 * ovs, y1 * ovs)
+  px = (xs / ovs + ox)[None, :]
+  py = (ys / ovs + oy)[:, None]
+
+  # same edge functions as kakirasterutils.edgeFunction
+  e01 = (p1.x - p0.x) * (py - p0.y) - (p1.y - p0.y) * (px - p0.x)
+  e12 = (p2.x - p1.x) * (py - p1.y) - (p2.y - p1.y) * (px - p1.x)
+  e20 = (p0.x - p2.x) * (py - p2.y) - (p0.y - p2.y) * (px - p2.x)
+  inside = (sgn * e01 >= 0) & (sgn * e12 >= 0) & (sgn * e20 >= 0)
+  iy, ix = np.nonzero(inside)
+  if len(iy) == 0: return
+
+  # barycentric weights
+  wgt0 = e12[iy, ix] / e123
+  wgt1 = e20[iy, ix] / e123
+  wgt2 = e01[iy, ix] / e123
+  idx = ys[iy] * sw + xs[ix]
+
+  views = bufferViews(buffer)
+  if buffer.zbuffer is not None:
+    z = p0.z * wgt0 + p1.z * wgt1 + p2.z * wgt2
+    closer = z > views['z'][idx]
+    idx = idx[closer]
+    wgt0 = wgt0[closer]
+    wgt1 = wgt1[closer]
+    wgt2 = wgt2[closer]
+    views['z'][idx] = z[closer]
+
+  # replace Nones with transparent phenotypes (as interpolatePhenotypes would)
+  ph0, ph1, ph2 = [phenotype(vel=0.0) if p is None else p for p in phenos]
+  views['cov'][idx] = 1
+  for channel in kakibuffer.CHANNELS:
+    c0 = getattr(ph0, channel)
+    c1 = getattr(ph1, channel)
+    c2 = getattr(ph2, channel)
+    views[channel][idx] = c0 * wgt0 + c1 * wgt1 + c2 * wgt2
+
+def fog(buffer, znear: float, zfar: float, cutfar: bool = True):
+  """Applies depth fog, see `kakibuffer.Buffer.fog`."""
+  if buffer.zbuffer is None or buffer.size == 0: return
+  buffer.resolved = None
+  dz = zfar - znear
+  views = bufferViews(buffer)
+  cov = views['cov']
+  vel = views['vel']
+  z = views['z']
+  drawn = (cov != 0) & (z != kakibuffer.ZEMPTY)
+  far = drawn & (z < zfar)
+  if cutfar:
+    cov[far] = 0
+  else:
+    vel[far] = 0
+  near = drawn & ~far & (z < znear)
+  vel[near] = vel[near] * (1 - (z[near] - znear) / dz)
+
+def transformCoords(coords, t: mat4):
+  """Transforms a flat array of coordinates in place, see `kakigeometryarrays.PointArray.transform`."""
+  if len(coords) == 0: return
+  c = np.frombuffer(coords, dtype=np.float64).reshape(-1, 4)
+  x = c[:, 0].copy()
+  y = c[:, 1].copy()
+  z = c[:, 2].copy()
+  w = c[:, 3].copy()
+  # same order of operations as kakiutils.transform, so results are identical
+  c[:, 0] = t.a11 * x + t.a12 * y + t.a13 * z + t.a14 * w
+  c[:, 1] = t.a21 * x + t.a22 * y + t.a23 * z + t.a24 * w
+  c[:, 2] = t.a31 * x + t.a32 * y + t.a33 * z + t.a34 * w
+  c[:, 3] = t.a41 * x + t.a42 * y + t.a43 * z + t.a44 * w
+
+def perspectiveDivideCoords(coords):
+  """Applies the perspective projection to a flat array of coordinates in place, see `kakigeometryarrays.PointArray.perspectiveDivide`."""
+  if len(coords) == 0: return
+  c = np.frombuffer(coords, dtype=np.float64).reshape(-1, 4)
+  w = np.maximum(c[:, 3], 1e-10)[:, None]
+  c[:, :3] /= w
+
+def drawTriangleDeferred(gbuffer, verts: list[vec4], normals: list[vec4], material: int):
+  """Draws a triangle onto a G-buffer, see `kakirasterizer.drawTriangleDeferred`."""
+  bbox = getBoundingBox(verts)
+  x0 = max(0, math.floor(bbox.x0 - gbuffer.originx))
+  y0 = max(0, math.floor(bbox.y0 - gbuffer.originy))
+  x1 = min(gbuffer.width, math.ceil(bbox.x1 - gbuffer.originx))
+  y1 = min(gbuffer.height, math.ceil(bbox.y1 - gbuffer.originy))
+  if x0 >= x1 or y0 >= y1: return
+
+  ovs = gbuffer.oversample
+  sw = gbuffer.width * ovs
+  p0, p1, p2 = verts
+  e123 = (p1.x - p0.x) * (p2.y - p0.y) - (p1.y - p0.y) * (p2.x - p0.x)
+  if e123 == 0: return
+  if e123 < 0 and not config.cull_backface: return
+  if e123 > 0 and not config.cull_frontface: return
+  sgn = 1 if e123 > 0 else -1
+
+  xs = np.arange(x0 * ovs, x1 * ovs)
+  ys = np.arange(y0 * ovs, y1 * ovs)
+  px = (xs / ovs + gbuffer.originx)[None, :]
+  py = (ys / ovs + gbuffer.originy)[:, None]
+  e01 = (p1.x - p0.x) * (py - p0.y) - (p1.y - p0.y) * (px - p0.x)
+  e12 = (p2.x - p1.x) * (py - p1.y) - (p2.y - p1.y) * (px - p1.x)
+  e20 = (p0.x - p2.x) * (py - p2.y) - (p0.y - p2.y) * (px - p2.x)
+  iy, ix = np.nonzero((sgn * e01 >= 0) & (sgn * e12 >= 0) & (sgn * e20 >= 0))
+  if len(iy) == 0: return
+
+  wgt0 = e12[iy, ix] / e123
+  wgt1 = e20[iy, ix] / e123
+  wgt2 = e01[iy, ix] / e123
+  idx = ys[iy] * sw + xs[ix]
+
+  zbuffer = np.frombuffer(gbuffer.zbuffer, dtype=np.float64)
+  z = p0.z * wgt0 + p1.z * wgt1 + p2.z * wgt2
+  closer = z > zbuffer[idx]
+  idx = idx[closer]
+  wgt0 = wgt0[closer]
+  wgt1 = wgt1[closer]
+  wgt2 = wgt2[closer]
+  zbuffer[idx] = z[closer]
+  np.frombuffer(gbuffer.mat, dtype=np.int16)[idx] = material
+  n0, n1, n2 = normals
+  for channel in ('x', 'y', 'z'):
+    c0 = getattr(n0, channel)
+    c1 = getattr(n1, channel)
+    c2 = getattr(n2, channel)
+    np.frombuffer(getattr(gbuffer, 'n' + channel), dtype=np.float32)[idx] = c0 * wgt0 + c1 * wgt1 + c2 * wgt2
+
+def shade(gbuffer, buffer, light: vec4, lightPheno: phenotype, shininess: float, fogNear: float | None, fogFar: float | None, cutfar: bool):
+  """Lights and fogs a G-buffer into buffer, see `kakigbuffer.GBuffer.shade` (light is already inverted and normalized)."""
+  mat = np.frombuffer(gbuffer.mat, dtype=np.int16)
+  z = np.frombuffer(gbuffer.zbuffer, dtype=np.float64)
+  drawn = mat >= 0
+  if fogNear is not None and cutfar:
+    drawn &= z >= fogFar
+  idx = np.flatnonzero(drawn)
+  if len(idx) == 0: return
+  mid = mat[idx]
+  z = z[idx]
+
+  nx = np.frombuffer(gbuffer.nx, dtype=np.float32)[idx].astype(np.float64)
+  ny = np.frombuffer(gbuffer.ny, dtype=np.float32)[idx].astype(np.float64)
+  nz = np.frombuffer(gbuffer.nz, dtype=np.float32)[idx].astype(np.float64)
+  norm = np.sqrt(nx * nx + ny * ny + nz * nz)
+  amt = np.zeros_like(norm)
+  nonzero = norm != 0
+  amt[nonzero] = (nx[nonzero] * light.x + ny[nonzero] * light.y + nz[nonzero] * light.z) / norm[nonzero]
+  amt = np.clip(amt, -1, 1)
+  if shininess > 0:
+    amt = np.sign(amt) * (np.power(2, 10 * shininess * np.abs(amt)) - 1) / (pow(2, 10 * shininess) - 1)
+  lit = amt > 0
+
+  views = bufferViews(buffer)
+  for channel in kakibuffer.CHANNELS:
+    values = np.array([getattr(m, channel) for m in gbuffer.materials], dtype=np.float64)[mid]
+    if channel == 'vel':
+      values = np.where(lit, values * (1 - amt) + lightPheno.vel * amt, values * (amt + 1))
+      if fogNear is not None:
+        values = np.where(z < fogFar, 0.0, np.where(z < fogNear, values * (1 - (z - fogNear) / (fogFar - fogNear)), values))
+    elif channel != 'opa':
+      # mix material phenotype with light, keep original opacity
+      values = np.where(lit, values * (1 - amt) + getattr(lightPheno, channel) * amt, values)
+    views[channel][idx] = values
+  views['cov'][idx] = 1
+  views['z'][idx] = z
\ No newline at end of file
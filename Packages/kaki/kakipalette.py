@@ -0,0 +1,211 @@
+"""
+Quantized phenotypes and palettes.
+
+In the end every phenotype becomes a note, and notes only know a few steps per property (e.g. velocity in 1/128
+steps, color as one of 16). A quantized phenotype holds its channels as small integers in these steps (fixed point),
+opacity in 1/255 steps. Identical quantized phenotypes are interned in a palette, so a `PaletteBuffer` only stores one
+palette index per pixel. Mixing samples is done in integer arithmetic, and pixels with the same index are guaranteed
+to become identical notes.
+
+Quantizing is a step on render: rasterization still writes the float channels of every sample into a `Buffer`, which
+is then quantized by `PaletteBuffer.fromBuffer`, a pixel row at a time. So this doesn't save memory while rasterizing
+(nor does it add more than the palette indices), it only makes mixing integer arithmetic and merging a comparison of
+palette indices.
+
+Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
+"""
+
+from array import array
+
+from kakibuffer import Buffer, CHANNELS
+from kakiprimitives import phenotype
+
+type qphenotype = tuple[int, int, int, int, int, int, int, int]
+"Type alias for a quantized phenotype (vel, pan, rel, pof, cut, res, col, opa in fixed point, see `SCALES`)"
+
+SCALES = (128, 128, 128, 1, 255, 255, 1, 255)
+"fixed point scale per channel (in order of `CHANNELS`), same steps as FL stores the note properties"
+
+EMPTY = -1
+"palette index of empty pixels"
+
+def quantizePhenotype(pheno: phenotype) -> qphenotype:
+  """Returns a phenotype in fixed point (channels rounded to their steps, pitch offset truncated like on render)."""
+  return (
+    round(pheno.vel * 128),
+    round(pheno.pan * 128),
+    round(pheno.rel * 128),
+    int(pheno.pof),
+    round(pheno.cut * 255),
+    round(pheno.res * 255),
+    round(pheno.col),
+    round(pheno.opa * 255),
+  )
+
+def dequantizePhenotype(q: qphenotype) -> phenotype:
+  """Returns a quantized phenotype as phenotype again."""
+  return phenotype(q[0] / 128, q[1] / 128, q[2] / 128, q[3], q[4] / 255, q[5] / 255, q[6], q[7] / 255)
+
+def mixQuantized(qs: list[qphenotype | None]) -> qphenotype | None:
+  """Mixes quantized phenotypes in integer arithmetic (None counts as transparent).
+
+  Same as `Buffer.resolve` does for samples: the channels are the opacity weighted average, the opacity is the average
+  opacity. Results are rounded to the nearest step.
+  """
+  n = len(qs)
+  present = [q for q in qs if q is not None]
+  if len(present) == 0: return None
+  wgtTot = sum(q[7] for q in present)
+  opa = (2 * wgtTot + n) // (2 * n)
+  if wgtTot == 0:
+    # all transparent: plain average
+    wgts = [1] * len(present)
+    wgtTot = len(present)
+  else:
+    wgts = [q[7] for q in present]
+  half = wgtTot // 2
+  # floor division rounds towards -inf, which is right for the (possibly negative) pitch offset as well
+  return tuple(
+    (sum(w * q[k] for w, q in zip(wgts, present)) + half) // wgtTot for k in range(7)
+  ) + (opa,)
+
+class Palette:
+  """Interned quantized phenotypes, every distinct one is stored once and referred to by its index.
+  """
+  def __init__(self):
+    self.entries: list[qphenotype] = []
+    "quantized phenotypes, indexed by palette index"
+    self.indices: dict[qphenotype, int] = {}
+    "palette index per quantized phenotype"
+    self.mixes: dict[tuple[tuple[int, ...], ...], int] = {}
+    "palette index of already mixed combinations of palette indices"
+
+  def __len__(self) -> int:
+    return len(self.entries)
+
+  def __getitem__(self, index: int) -> qphenotype:
+    return self.entries[index]
+
+  def intern(self, q: qphenotype) -> int:
+    """Returns the palette index of a quantized phenotype, adds it if it's new."""
+    index = self.indices.get(q)
+    if index is None:
+      index = len(self.entries)
+      self.entries.append(q)
+      self.indices[q] = index
+    return index
+
+  def add(self, pheno: phenotype | None) -> int:
+    """Returns the palette index of a phenotype (quantized), `EMPTY` for None."""
+    if pheno is None: return EMPTY
+    return self.intern(quantizePhenotype(pheno))
+
+  def mix(self, indices: tuple[tuple[int, ...], ...]) -> int:
+    """Returns the palette index of the mix of palette indices (see `mixQuantized`), `EMPTY` counts as transparent.
+    Indices are given per sample row. Each combination is only ever mixed once.
+    """
+    index = self.mixes.get(indices)
+    if index is None:
+      flat = [i for row in indices for i in row]
+      first = flat[0]
+      if all(i == first for i in flat):
+        # uniform (e.g. inside of a polygon), mixing doesn't change a thing
+        index = first
+      else:
+        mixed = mixQuantized([None if i == EMPTY else self.entries[i] for i in flat])
+        index = EMPTY if mixed is None else self.intern(mixed)
+      self.mixes[indices] = index
+    return index
+
+  def getPhenotype(self, index: int) -> phenotype | None:
+    """Returns the phenotype of a palette index, None for `EMPTY`."""
+    if index == EMPTY: return None
+    return dequantizePhenotype(self.entries[index])
+
+class PaletteBuffer:
+  """Pixel buffer that stores a palette index per pixel (no oversampling).
+  """
+  def __init__(self, width: int, height: int, palette: Palette | None = None):
+    self.width = width
+    "width of buffer in pixels"
+    self.height = height
+    "height of buffer in pixels"
+    self.palette = Palette() if palette is None else palette
+    "palette the indices refer to"
+    self.index = array('i', [EMPTY]) * (width * height)
+    "palette index per pixel, `EMPTY` if nothing has been drawn"
+    self.originx = 0.0
+    "buffer x offset"
+    self.originy = 0.0
+    "buffer y offset"
+
+  def setOrigin(self, x: float, y: float):
+    """Sets the buffer's offset."""
+    self.originx = x
+    self.originy = y
+
+  @classmethod
+  def fromBuffer(cls, buffer: Buffer, palette: Palette | None = None) -> 'PaletteBuffer':
+    """Quantizes a rasterized buffer (the quantize on render step, the float buffer has to exist in full first).
+
+    Every sample is quantized and interned, then the samples of each pixel are mixed in integer arithmetic (see
+    `Palette.mix`), so the result can differ from `Buffer.resolve` by a step. Samples are quantized one pixel row at a
+    time, so besides the palette indices only a row of them is held.
+    """
+    ovs = buffer.oversample
+    w = buffer.width
+    sw = w * ovs
+    result = cls(w, buffer.height, palette)
+    result.setOrigin(buffer.originx, buffer.originy)
+    palette = result.palette
+    intern = palette.intern
+
+    # quantize and intern the samples of a sample row, channel by channel (only between its first and its last
+    # covered sample), into target at offset
+    cov = memoryview(buffer.cov)
+    channels = [(channel, getattr(buffer, channel), s) for channel, s in zip(CHANNELS, SCALES)]
+    def quantizeRow(r: int, target: array, offset: int) -> bool:
+      covRow = cov[r:r + sw].tobytes()
+      a = covRow.find(1)
+      if a < 0: return False
+      b = covRow.rfind(1) + 1
+      columns = []
+      for channel, data, s in channels:
+        if channel == 'pof':
+          columns.append(map(int, data[r + a:r + b]))
+        elif s == 1:
+          columns.append(map(round, data[r + a:r + b]))
+        else:
+          columns.append([round(v * s) for v in data[r + a:r + b]])
+      target[offset + a:offset + b] = array('i', [intern(q) if c else EMPTY for q, c in zip(zip(*columns), covRow[a:b])])
+      return True
+
+    index = result.index
+    if ovs == 1:
+      # samples are pixels
+      for y in range(buffer.height):
+        quantizeRow(y * sw, index, y * w)
+      return result
+
+    # one pixel row at a time: quantize its sample rows, then mix the samples of each pixel, keyed by the (per sample
+    # row) tuples of their palette indices
+    mix = palette.mix
+    empty = array('i', [EMPTY]) * (ovs * sw)
+    samples = array('i', empty)
+    for y in range(buffer.height):
+      covered = False
+      for sy in range(ovs):
+        covered = quantizeRow((y * ovs + sy) * sw, samples, sy * sw) or covered
+      if not covered: continue
+      chunks = [[tuple(samples[i:i + ovs]) for i in range(r, r + sw, ovs)] for r in range(0, ovs * sw, sw)]
+      index[y * w:(y + 1) * w] = array('i', map(mix, zip(*chunks)))
+      samples[:] = empty
+    return result
+
+  def getIndexAt(self, x: int, y: int) -> int:
+    """Returns the palette index of a pixel."""
+    return self.index[y * self.width + x]
+
+  def getPhenotypeAt(self, x: int, y: int) -> phenotype | None:
+    """Returns the phenotype of a pixel."""
+    return self.palette.getPhenotype(self.index[y * self.width + x])
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""
+Tile based parallel rasterization.
+
+Triangles (or figure edges) are binned into screen tiles of the buffer. Every tile is rasterized by a worker process
+into its own tile buffer, which is then stitched back into the main buffer. Only used if `config.use_parallel` is set,
+if the process pool fails the callers fall back to rendering serially.
+
+Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
+"""
+
+import concurrent.futures
+import math
+import pickle
+from array import array
+
+import kakirasterizer
+from kakibuffer import Buffer, CHANNELS
+from kakiprimitives import vec4, phenotype, tri, mesh
+from kakirasterutils import aetEdge
+
+import kakiconfig as config
+
+executor: concurrent.futures.ProcessPoolExecutor | None = None
+"process pool, created on first use and kept for subsequent renders"
+
+type tileSpec = tuple[float, float, int, int, int, bool, list[bytes], tuple[bool, bool, bool]]
+"Type alias for everything a worker needs to rebuild a tile buffer (originx, originy, width, height, optOversample, zbuffer, sample data, config)"
+
+def getExecutor() -> concurrent.futures.ProcessPoolExecutor:
+  """Returns the process pool, creates it if necessary."""
+  global executor
+  if executor is None:
+    executor = concurrent.futures.ProcessPoolExecutor(config.parallel_workers)
+  return executor
+
+def sampleArrayNames(buffer: Buffer) -> list[str]:
+  """Returns the names of all sample arrays of a buffer."""
+  names = ['cov', *CHANNELS]
+  if buffer.zbuffer is not None:
+    names.append('zbuffer')
+  return names
+
+def readTile(buffer: Buffer, x0: int, y0: int, w: int, h: int) -> list[bytes]:
+  """Copies the samples of a rect of pixels out of a buffer, one bytes object per sample array."""
+  ovs = buffer.oversample
+  sw = buffer.width * ovs
+  tw = w * ovs
+  tileData = []
+  for name in sampleArrayNames(buffer):
+    data = getattr(buffer, name)
+    tile = array(data.typecode)
+    for sy in range(y0 * ovs, (y0 + h) * ovs):
+      i0 = sy * sw + x0 * ovs
+      tile.extend(data[i0:i0 + tw])
+    tileData.append(tile.tobytes())
+  return tileData
+
+def writeTile(buffer: Buffer, x0: int, y0: int, w: int, h: int, tileData: list[bytes]):
+  """Copies the samples of a rect of pixels (as returned by `readTile`) into a buffer."""
+  buffer.resolved = None
+  ovs = buffer.oversample
+  sw = buffer.width * ovs
+  tw = w * ovs
+  for name, raw in zip(sampleArrayNames(buffer), tileData):
+    data = getattr(buffer, name)
+    tile = array(data.typecode)
+    tile.frombytes(raw)
+    for r in range(h * ovs):
+      i0 = (y0 * ovs + r) * sw + x0 * ovs
+      data[i0:i0 + tw] = tile[r * tw:(r + 1) * tw]
+
+def createTileSpec(buffer: Buffer, x0: int, y0: int, w: int, h: int) -> tileSpec:
+  """Describes a rect of pixels of a buffer (including its current samples) as tile for a worker."""
+  return (
+    buffer.originx + x0,
+    buffer.originy + y0,
+    w,
+    h,
+    buffer.oversample.bit_length() - 1,
+    buffer.zbuffer is not None,
+    readTile(buffer, x0, y0, w, h),
+    (config.cull_frontface, config.cull_backface, config.use_numpy),
+  )
+
+def createTileBuffer(spec: tileSpec) -> Buffer:
+  """Rebuilds a tile buffer in a worker."""
+  originx, originy, w, h, optOversample, zbuffer, tileData, cfg = spec
+  config.cull_frontface, config.cull_backface, config.use_numpy = cfg
+  buffer = Buffer(w, h, optOversample, zbuffer)
+  buffer.setOrigin(originx, originy)
+  for name, raw in zip(sampleArrayNames(buffer), tileData):
+    data = array(getattr(buffer, name).typecode)
+    data.frombytes(raw)
+    setattr(buffer, name, data)
+  return buffer
+
+def drawTrianglesTile(spec: tileSpec, tris: list[tuple[list[vec4], list[phenotype]]]) -> list[bytes]:
+  """Worker: draws triangles onto a tile, returns the tile's samples."""
+  buffer = createTileBuffer(spec)
+  for verts, phenos in tris:
+    kakirasterizer.drawTriangle(buffer, verts, phenos)
+  return readTile(buffer, 0, 0, buffer.width, buffer.height)
+
+def drawEdgesTile(spec: tileSpec, edges: list[aetEdge], fill: phenotype, fillRule: int, plane: vec4 | None) -> list[bytes]:
+  """Worker: fills edges onto a tile, returns the tile's samples."""
+  buffer = createTileBuffer(spec)
+  kakirasterizer.drawEdges(buffer, edges, fill, fillRule, plane)
+  return readTile(buffer, 0, 0, buffer.width, buffer.height)
+
+def runTiles(buffer: Buffer, jobs: list[tuple[tuple[int, int, int, int], callable, tuple]]) -> bool:
+  """Runs all tile jobs in the process pool and stitches the results into the buffer.
+
+  Args:
+    buffer (Buffer): target buffer
+    jobs (list): (tile rect, worker function, worker args) per tile
+
+  Returns:
+    bool: True on success, False if the pool failed (buffer is left untouched)
+
+  Raises:
+    Exception: whatever a worker raised
+  """
+  global executor
+  try:
+    from concurrent.futures.process import BrokenProcessPool
+  except ImportError:
+    # no process support at all (e.g. missing _multiprocessing)
+    config.use_parallel = False
+    return False
+
+  try:
+    pool = getExecutor()
+    futures = [pool.submit(fn, *args) for rect, fn, args in jobs]
+    results = [future.result() for future in futures]
+  except (BrokenProcessPool, OSError, NotImplementedError, pickle.PicklingError):
+    # the pool itself failed (e.g. no way to spawn processes), don't try again. Exceptions raised by the workers aren't
+    # caught, they're bugs just like when drawing serially
+    if executor is not None:
+      executor.shutdown(wait=False, cancel_futures=True)
+    config.use_parallel = False
+    executor = None
+    return False
+
+  for (rect, fn, args), tileData in zip(jobs, results):
+    writeTile(buffer, *rect, tileData)
+  return True
+
+def drawTriangles(buffer: Buffer, mesh: mesh, tris: list[tri]) -> bool:
+  """Draws triangles of a mesh onto buffer, binned into square tiles that are rasterized in parallel.
+
+  Returns:
+    bool: True on success, False if the caller has to draw serially
+  """
+  ts = config.parallel_tile_size
+  w = buffer.width
+  h = buffer.height
+  ox = buffer.originx
+  oy = buffer.originy
+
+  # bin triangles by the tiles their (clipped) bounding box touches
+  bins: dict[tuple[int, int], list] = {}
+  for tri in tris:
+    verts = [mesh.verts[tri[0]], mesh.verts[tri[1]], mesh.verts[tri[2]]]
+    phenos = [mesh.phenos[tri[0]], mesh.phenos[tri[1]], mesh.phenos[tri[2]]]
+    x0 = max(0, math.floor(min(v.x for v in verts) - ox))
+    y0 = max(0, math.floor(min(v.y for v in verts) - oy))
+    x1 = min(w, math.ceil(max(v.x for v in verts) - ox))
+    y1 = min(h, math.ceil(max(v.y for v in verts) - oy))
+    if x0 >= x1 or y0 >= y1: continue
+    for ty in range(y0 // ts, (y1 - 1) // ts + 1):
+      for tx in range(x0 // ts, (x1 - 1) // ts + 1):
+        bins.setdefault((tx, ty), []).append((verts, phenos))
+
+  jobs = []
+  for (tx, ty), binned in bins.items():
+    rect = (tx * ts, ty * ts, min(ts, w - tx * ts), min(ts, h - ty * ts))
+    jobs.append((rect, drawTrianglesTile, (createTileSpec(buffer, *rect), binned)))
+
+  return runTiles(buffer, jobs)
+
+def drawEdges(buffer: Buffer, edges: list[aetEdge], fill: phenotype, fillRule: int = 0, plane: vec4 | None = None) -> bool:
+  """Fills the edges of a figure onto buffer, binned into full width bands that are rasterized in parallel.
+  (Bands instead of tiles, because the inclusion of a sample depends on all crossings to its right.)
+
+  Returns:
+    bool: True on success, False if the caller has to draw serially
+  """
+  ts = config.parallel_tile_size
+  w = buffer.width
+  h = buffer.height
+  ovs = buffer.oversample
+  oy = buffer.originy
+
+  jobs = []
+  for y0 in range(0, h, ts):
+    bh = min(ts, h - y0)
+    # y of the first and last scanline in this band
+    py0 = (y0 * ovs) / ovs + oy
+    py1 = ((y0 + bh) * ovs - 1) / ovs + oy
+    binned = [e for e in edges if e[0] <= py1 and e[1] > py0]
+    if len(binned) == 0: continue
+    rect = (0, y0, w, bh)
+    jobs.append((rect, drawEdgesTile, (createTileSpec(buffer, *rect), binned, fill, fillRule, plane)))
+
+  return runTiles(buffer, jobs)
\ No newline at end of file
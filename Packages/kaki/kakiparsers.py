@@ -3,9 +3,17 @@ Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
 """
 
 import math
+from collections import OrderedDict
 
+from kakigeometryarrays import FigureArray
+from kakigeometryutils import getFigureBoundingBox
 from kakiprimitives import vec4, figure, phenotype
-from kakiutils import vecangle
+from kakiutils import vecangle, TransformBuilder
+
+figureCacheSize = 16
+"how many figures `parseNormalizedFigureFromSvgPath` keeps"
+figureCache: OrderedDict[tuple, FigureArray] = OrderedDict()
+"figures parsed by `parseNormalizedFigureFromSvgPath`, least recently used first"
 
 def parsePhenotypeFromStyle(style: str):
   """Parses a CSS-like style string for note phenotypes and returns the interpreted phenotype.
@@ -82,21 +90,22 @@ def serializePhenotypeToStyle(pheno: phenotype) -> str:
 
   return '; '.join(texts)
 
-def parseFigureFromSvgPath(path: str) -> figure:
-  """Parses SVG path data (the `d` attribute) and turns it into a figure.
+def parseSvgPath(path: str) -> list[list[tuple]]:
+  """Parses SVG path data (the `d` attribute) into its subpaths, curves aren't flattened yet (see `flattenSvgPath`).
 
   Args:
     path (str): any valid SVG path data
 
   Returns:
-    figure: the interpreted figure
+    list[list[tuple]]: segments per subpath, each a tuple of its kind and coordinates: ('M', x, y), ('L', x, y),
+      ('Q', x1, y1, cx, cy, x2, y2), ('C', x1, y1, cx1, cy1, cx2, cy2, x2, y2) or ('A', x1, y1, rx, ry, phi, fA, fS, x2, y2)
   """
 
   cursor = 0
   cend = len(path)
 
-  polygons = []
-  curPoly = None
+  subpaths = []
+  curPath = None
   cmd = None
   x = 0
   y = 0
@@ -149,97 +158,6 @@ def parseFigureFromSvgPath(path: str) -> figure:
     if c0 == cursor: return None
     return int(path[c0:cursor])
   
-  def drawQuadraticBezier(x1, y1, cx, cy, x2, y2):
-    nonlocal curPoly
-    # draw arc in pieces of straight lines
-    # TODO: dynamic pcs count dep. on curve length etc
-    pcs = 24
-    for i in range(pcs):
-      t = (i + 1) / pcs
-      tinv = 1 - t
-      # https://en.wikipedia.org/wiki/Bézier_curve
-      x = tinv ** 2 * x1 + 2 * tinv * t * cx + t ** 2 * x2
-      y = tinv ** 2 * y1 + 2 * tinv * t * cy + t ** 2 * y2
-      curPoly.append(vec4(x,y))
-  
-  def drawCubicBezier(x1, y1, cx1, cy1, cx2, cy2, x2, y2):
-    nonlocal curPoly
-    # draw arc in pieces of straight lines
-    # TODO: dynamic pcs count dep. on curve length etc
-    pcs = 24
-    for i in range(pcs):
-      t = (i + 1) / pcs
-      tinv = 1 - t
-      # https://en.wikipedia.org/wiki/Bézier_curve
-      x = tinv ** 3 * x1 + 3 * tinv ** 2 * t * cx1 + 3 * tinv * t ** 2 * cx2 + t ** 3 * x2
-      y = tinv ** 3 * y1 + 3 * tinv ** 2 * t * cy1 + 3 * tinv * t ** 2 * cy2 + t ** 3 * y2
-      curPoly.append(vec4(x,y))
-  
-  def drawArc(x1, y1, rx, ry, phi, fA, fS, x2, y2):
-    nonlocal curPoly
-    # https://www.w3.org/TR/SVG2/implnote.html#ArcCorrectionOutOfRangeRadii
-
-    # B.2.5: ensure radii are non-zero (otherwise draw a straight line)
-    if rx == 0 or ry == 0:
-      curPoly.append(vec4(x2,y2))
-      return
-
-    # B.2.5: ensure radii are positive
-    rx = abs(rx)
-    ry = abs(ry)
-
-    # B.2.4: prime x1 and y1
-    phi = rotation / 180 * math.pi
-    cosphi = math.cos(phi)
-    sinphi = math.sin(phi)
-    dxmid = (x1 - x2) / 2
-    dymid = (y1 - y2) / 2
-    x1primed = cosphi * dxmid + sinphi * dymid
-    y1primed = -sinphi * dxmid + cosphi * dymid
-
-    # B.2.5: ensure radii are large enough
-    Lambda = x1primed ** 2 / rx ** 2 + y1primed ** 2 / ry ** 2
-    if (Lambda > 1):
-      sqrLambda = math.sqrt(Lambda)
-      rx = sqrLambda * rx
-      ry = sqrLambda * ry
-
-    # B.2.4: compute primed center coordinates
-    thatradicand = (rx ** 2 * ry ** 2 - rx ** 2 * y1primed ** 2 - ry ** 2 * x1primed ** 2) / (rx ** 2 * y1primed ** 2 + ry ** 2 * x1primed ** 2)
-    # should never be negative, but epsilon...
-    thatroot = 0 if thatradicand < 0 else math.sqrt(thatradicand)
-    thatsign = 1 if fA != fS else -1
-    cxprimed = thatsign * thatroot * (rx / ry * y1primed)
-    cyprimed = thatsign * thatroot * (-ry / rx * x1primed)
-
-    # B.2.4: compute center coordinates
-    cx = cosphi * cxprimed - sinphi * cyprimed + (x1 + x2) / 2
-    cy = sinphi * cxprimed + cosphi * cyprimed + (y1 + y2) / 2
-
-    # B.2.4: compute theta1 and dtheta
-    vstart = vec4((x1primed - cxprimed) / rx, (y1primed - cyprimed) / ry)
-    vend = vec4((-x1primed - cxprimed) / rx, (-y1primed - cyprimed) / ry)
-    theta1 = vecangle(vec4(1,0), vstart)
-    dtheta = vecangle(vstart, vend)
-
-    if fS == 0 and dtheta > 0:
-      dtheta -= 2 * math.pi
-    if fS == 1 and dtheta < 0:
-      dtheta += 2 * math.pi
-
-    # draw arc in pieces of straight lines
-    # TODO: dynamic pcs count dep. on arc length etc
-    pcs = 24
-    for i in range(pcs):
-      f = (i + 1) / pcs
-      theta = theta1 + dtheta * f
-      _x = rx * math.cos(theta)
-      _y = ry * math.sin(theta)
-      x = cosphi * _x - sinphi * _y + cx
-      y = sinphi * _x + cosphi * _y + cy
-      curPoly.append(vec4(x,y))
-
-
   live = 100000
   while cursor < len(path) and live:
     # always keep track of currect cursor coordinate
@@ -253,34 +171,34 @@ def parseFigureFromSvgPath(path: str) -> figure:
       cmdUC = cmd.upper()
       rel = cmd.islower()
       if cmdUC == 'M':
-        curPoly = []
-        polygons.append(curPoly)
+        curPath = []
+        subpaths.append(curPath)
         x = x + getNumber() if rel else getNumber()
         getCommaWsp()
         y = y + getNumber() if rel else getNumber()
         if x is not None and y is not None:
-          curPoly.append(vec4(x,y))
+          curPath.append(('M', x, y))
         # subsequent pairs are treated as implicit lineto commands
         cmd = 'l' if rel else 'L'
       elif cmdUC == 'Z':
-        p0 = curPoly[0]
-        x = p0.x
-        y = p0.y
-        curPoly.append(vec4(x, y))
+        p0 = curPath[0]
+        x = p0[-2]
+        y = p0[-1]
+        curPath.append(('L', x, y))
       elif cmdUC == 'L':
         x = x + getNumber() if rel else getNumber()
         getCommaWsp()
         y = y + getNumber() if rel else getNumber()
         if x is not None and y is not None:
-          curPoly.append(vec4(x,y))
+          curPath.append(('L', x, y))
       elif cmdUC == 'H':
         x = x + getNumber() if rel else getNumber()
         if x is not None and y is not None:
-          curPoly.append(vec4(x,y))
+          curPath.append(('L', x, y))
       elif cmdUC == 'V':
         y = y + getNumber() if rel else getNumber()
         if x is not None and y is not None:
-          curPoly.append(vec4(x,y))
+          curPath.append(('L', x, y))
       elif cmdUC == 'C':
         u1 = x + getNumber() if rel else getNumber()
         getCommaWsp()
@@ -296,7 +214,7 @@ def parseFigureFromSvgPath(path: str) -> figure:
         if x is not None and y is not None:
           cpx = u2
           cpy = v2
-          drawCubicBezier(x1, y1, u1, v1, u2, v2, x, y)
+          curPath.append(('C', x1, y1, u1, v1, u2, v2, x, y))
       elif cmdUC == 'S':
         u2 = x + getNumber() if rel else getNumber()
         getCommaWsp()
@@ -315,7 +233,7 @@ def parseFigureFromSvgPath(path: str) -> figure:
             v1 = y1
           cpx = u2
           cpy = v2
-          drawCubicBezier(x1, y1, u1, v1, u2, v2, x, y)
+          curPath.append(('C', x1, y1, u1, v1, u2, v2, x, y))
       elif cmdUC == 'Q':
         u1 = x + getNumber() if rel else getNumber()
         getCommaWsp()
@@ -327,7 +245,7 @@ def parseFigureFromSvgPath(path: str) -> figure:
         if x is not None and y is not None:
           cpx = u1
           cpy = v1
-          drawQuadraticBezier(x1, y1, u1, v1, x, y)
+          curPath.append(('Q', x1, y1, u1, v1, x, y))
       elif cmdUC == 'T':
         x = x + getNumber() if rel else getNumber()
         getCommaWsp()
@@ -342,7 +260,7 @@ def parseFigureFromSvgPath(path: str) -> figure:
             v1 = y1
           cpx = u1
           cpy = v1
-          drawQuadraticBezier(x1, y1, u1, v1, x, y)
+          curPath.append(('Q', x1, y1, u1, v1, x, y))
       elif cmdUC == 'A':
         rx = getNumber()
         getCommaWsp()
@@ -358,7 +276,7 @@ def parseFigureFromSvgPath(path: str) -> figure:
         getCommaWsp()
         y = y + getNumber() if rel else getNumber()
         if x is not None and y is not None:
-          drawArc(x1, y1, rx, ry, rotation / 180 * math.pi, large, sweep, x, y)
+          curPath.append(('A', x1, y1, rx, ry, rotation / 180 * math.pi, large, sweep, x, y))
 
       # drop control point memory except in curve commands
       if not cmdUC in ['C', 'S', 'Q', 'T']:
@@ -370,4 +288,230 @@ def parseFigureFromSvgPath(path: str) -> figure:
     except Exception:
       break
   
-  return polygons
\ No newline at end of file
+  return subpaths
+
+def flattenSvgPath(subpaths: list[list[tuple]], tolerance: float | None = None) -> figure:
+  """Turns parsed SVG path data (see `parseSvgPath`) into a figure, curves are split into straight lines.
+
+  Args:
+    subpaths (list[list[tuple]]): parsed SVG path data
+    tolerance (float | None): largest distance (in path units) between a curve and its flattened polygon,
+      curves are split into as few straight lines as needed to stay within it. If None, every curve is split into 24 lines.
+
+  Returns:
+    figure: the flattened figure
+  """
+  polygons = []
+  curPoly = None
+
+  def getBezierPieces(degree, points):
+    # Wang's formula: uniform pieces needed for a Bézier curve to stay within tolerance of its polygon,
+    # driven by the largest second difference of the control points
+    if tolerance is None: return 24
+    m = 0
+    for i in range(len(points) - 2):
+      ddx = points[i][0] - 2 * points[i+1][0] + points[i+2][0]
+      ddy = points[i][1] - 2 * points[i+1][1] + points[i+2][1]
+      m = max(m, math.sqrt(ddx ** 2 + ddy ** 2))
+    pcs = math.ceil(math.sqrt(degree * (degree - 1) / 8 * m / tolerance))
+    return min(max(pcs, 1), 1024)
+
+  def getArcPieces(r, dtheta):
+    # pieces needed for the sagitta of each piece to stay within tolerance, at least one per quarter turn
+    if tolerance is None: return 24
+    pcs = math.ceil(abs(dtheta) / (math.pi / 2))
+    if tolerance < r:
+      pcs = max(pcs, math.ceil(abs(dtheta) / (2 * math.acos(1 - tolerance / r))))
+    return min(max(pcs, 1), 1024)
+
+  def drawQuadraticBezier(x1, y1, cx, cy, x2, y2):
+    nonlocal curPoly
+    # draw arc in pieces of straight lines
+    pcs = getBezierPieces(2, [(x1, y1), (cx, cy), (x2, y2)])
+    for i in range(pcs):
+      t = (i + 1) / pcs
+      tinv = 1 - t
+      # https://en.wikipedia.org/wiki/Bézier_curve
+      x = tinv ** 2 * x1 + 2 * tinv * t * cx + t ** 2 * x2
+      y = tinv ** 2 * y1 + 2 * tinv * t * cy + t ** 2 * y2
+      curPoly.append(vec4(x,y))
+  
+  def drawCubicBezier(x1, y1, cx1, cy1, cx2, cy2, x2, y2):
+    nonlocal curPoly
+    # draw arc in pieces of straight lines
+    pcs = getBezierPieces(3, [(x1, y1), (cx1, cy1), (cx2, cy2), (x2, y2)])
+    for i in range(pcs):
+      t = (i + 1) / pcs
+      tinv = 1 - t
+      # https://en.wikipedia.org/wiki/Bézier_curve
+      x = tinv ** 3 * x1 + 3 * tinv ** 2 * t * cx1 + 3 * tinv * t ** 2 * cx2 + t ** 3 * x2
+      y = tinv ** 3 * y1 + 3 * tinv ** 2 * t * cy1 + 3 * tinv * t ** 2 * cy2 + t ** 3 * y2
+      curPoly.append(vec4(x,y))
+  
+  def drawArc(x1, y1, rx, ry, phi, fA, fS, x2, y2):
+    nonlocal curPoly
+    # https://www.w3.org/TR/SVG2/implnote.html#ArcCorrectionOutOfRangeRadii
+
+    # B.2.5: ensure radii are non-zero (otherwise draw a straight line)
+    if rx == 0 or ry == 0:
+      curPoly.append(vec4(x2,y2))
+      return
+
+    # B.2.5: ensure radii are positive
+    rx = abs(rx)
+    ry = abs(ry)
+
+    # B.2.4: prime x1 and y1
+    cosphi = math.cos(phi)
+    sinphi = math.sin(phi)
+    dxmid = (x1 - x2) / 2
+    dymid = (y1 - y2) / 2
+    x1primed = cosphi * dxmid + sinphi * dymid
+    y1primed = -sinphi * dxmid + cosphi * dymid
+
+    # B.2.5: ensure radii are large enough
+    Lambda = x1primed ** 2 / rx ** 2 + y1primed ** 2 / ry ** 2
+    if (Lambda > 1):
+      sqrLambda = math.sqrt(Lambda)
+      rx = sqrLambda * rx
+      ry = sqrLambda * ry
+
+    # B.2.4: compute primed center coordinates
+    thatradicand = (rx ** 2 * ry ** 2 - rx ** 2 * y1primed ** 2 - ry ** 2 * x1primed ** 2) / (rx ** 2 * y1primed ** 2 + ry ** 2 * x1primed ** 2)
+    # should never be negative, but epsilon...
+    thatroot = 0 if thatradicand < 0 else math.sqrt(thatradicand)
+    thatsign = 1 if fA != fS else -1
+    cxprimed = thatsign * thatroot * (rx / ry * y1primed)
+    cyprimed = thatsign * thatroot * (-ry / rx * x1primed)
+
+    # B.2.4: compute center coordinates
+    cx = cosphi * cxprimed - sinphi * cyprimed + (x1 + x2) / 2
+    cy = sinphi * cxprimed + cosphi * cyprimed + (y1 + y2) / 2
+
+    # B.2.4: compute theta1 and dtheta
+    vstart = vec4((x1primed - cxprimed) / rx, (y1primed - cyprimed) / ry)
+    vend = vec4((-x1primed - cxprimed) / rx, (-y1primed - cyprimed) / ry)
+    theta1 = vecangle(vec4(1,0), vstart)
+    dtheta = vecangle(vstart, vend)
+
+    if fS == 0 and dtheta > 0:
+      dtheta -= 2 * math.pi
+    if fS == 1 and dtheta < 0:
+      dtheta += 2 * math.pi
+
+    # draw arc in pieces of straight lines
+    pcs = getArcPieces(max(rx, ry), dtheta)
+    for i in range(pcs):
+      f = (i + 1) / pcs
+      theta = theta1 + dtheta * f
+      _x = rx * math.cos(theta)
+      _y = ry * math.sin(theta)
+      x = cosphi * _x - sinphi * _y + cx
+      y = sinphi * _x + cosphi * _y + cy
+      curPoly.append(vec4(x,y))
+
+
+  for segments in subpaths:
+    curPoly = []
+    polygons.append(curPoly)
+    for seg in segments:
+      kind = seg[0]
+      try:
+        if kind == 'M' or kind == 'L':
+          curPoly.append(vec4(seg[1], seg[2]))
+        elif kind == 'C':
+          drawCubicBezier(*seg[1:])
+        elif kind == 'Q':
+          drawQuadraticBezier(*seg[1:])
+        elif kind == 'A':
+          drawArc(*seg[1:])
+      except Exception:
+        # same as a parse error, the rest of the path is dropped
+        return polygons
+
+  return polygons
+
+def getSvgPathHeightPoints(subpaths: list[list[tuple]]) -> list[float]:
+  """Returns y coordinates of points on parsed SVG path data (see `parseSvgPath`) that span most of its height:
+  segment end points and the vertical extrema of Bézier curves (arcs only contribute their end points).
+  """
+  ys = []
+  for segments in subpaths:
+    for seg in segments:
+      kind = seg[0]
+      ys.append(seg[-1])
+      if kind == 'Q':
+        y1, cy, y2 = seg[2], seg[4], seg[6]
+        d = y1 - 2 * cy + y2
+        if d != 0 and 0 < (y1 - cy) / d < 1:
+          t = (y1 - cy) / d
+          ys.append((1 - t) ** 2 * y1 + 2 * (1 - t) * t * cy + t ** 2 * y2)
+      elif kind == 'C':
+        y1, cy1, cy2, y2 = seg[2], seg[4], seg[6], seg[8]
+        # roots of the derivative a*t^2 + b*t + c
+        a = -y1 + 3 * cy1 - 3 * cy2 + y2
+        b = 2 * (y1 - 2 * cy1 + cy2)
+        c = cy1 - y1
+        if a == 0:
+          ts = [-c / b] if b != 0 else []
+        else:
+          disc = b * b - 4 * a * c
+          ts = [(-b + sign * math.sqrt(disc)) / (2 * a) for sign in (1, -1)] if disc >= 0 else []
+        for t in ts:
+          if 0 < t < 1:
+            ys.append((1 - t) ** 3 * y1 + 3 * (1 - t) ** 2 * t * cy1 + 3 * (1 - t) * t ** 2 * cy2 + t ** 3 * y2)
+  return ys
+
+def parseFigureFromSvgPath(path: str, tolerance: float | None = None) -> figure:
+  """Parses SVG path data (the `d` attribute) and turns it into a figure.
+
+  Args:
+    path (str): any valid SVG path data
+    tolerance (float | None): largest distance (in path units) between a curve and its flattened polygon,
+      curves are split into as few straight lines as needed to stay within it. If None, every curve is split into 24 lines.
+
+  Returns:
+    figure: the interpreted figure
+  """
+  return flattenSvgPath(parseSvgPath(path), tolerance)
+
+def parseNormalizedFigureFromSvgPath(path: str, tolerance: float | None = None, maxHeight: float = 128, asArray: bool = False) -> figure | FigureArray | None:
+  """Parses SVG path data into a figure that is centered around the origin and scaled down to fit a given height.
+
+  Parsed figures are cached (by path, tolerance and height), each call returns a copy that may be changed freely.
+
+  Args:
+    path (str): any valid SVG path data
+    tolerance (float | None): flattening tolerance (see `parseFigureFromSvgPath`), in units of the normalized figure
+    maxHeight (float): figures higher than this are scaled down
+    asArray (bool): if True, the figure is returned as FigureArray (a plain copy of the cached coordinates)
+
+  Returns:
+    figure | FigureArray | None: the normalized figure, None if the path has no points
+  """
+  key = (path, tolerance, maxHeight)
+  fig = figureCache.get(key)
+  if fig is None:
+    subpaths = parseSvgPath(path)
+    if tolerance is not None:
+      # tolerance is given after scaling: points on the path never make it higher than it is, so they never scale down
+      # more than the flattened figure does
+      ys = getSvgPathHeightPoints(subpaths)
+      h = max(ys) - min(ys) if ys else 0
+      tolerance /= maxHeight / h if h > maxHeight else 1
+    fig = flattenSvgPath(subpaths, tolerance)
+    bbox = getFigureBoundingBox(fig)
+    if bbox is None: return None
+    cx = (bbox.x0 + bbox.x1) / 2
+    cy = (bbox.y0 + bbox.y1) / 2
+    h = bbox.y1 - bbox.y0
+    s = maxHeight / h if h > maxHeight else 1
+    fig = FigureArray.fromFigure(fig)
+    fig.transform(TransformBuilder().translate(-cx, -cy).scale(s, s).build())
+    figureCache[key] = fig
+    # evict least recently used
+    while len(figureCache) > figureCacheSize:
+      figureCache.popitem(last=False)
+  else:
+    figureCache.move_to_end(key)
+  return fig.copy() if asArray else fig.toFigure()
\ No newline at end of file
@@ -84,10 +84,14 @@ class phenotype:
 type tri = tuple[int, int, int]
 
 class mesh:
-  __slots__ = ['verts', 'normals', 'phenos', 'tris']
+  __slots__ = ['verts', 'normals', 'phenos', 'tris', 'points', 'pointIndex']
 
   def __init__(self, verts: list[vec4], phenos: list[phenotype], tris: list[tri]):
     self.verts = verts
     self.normals = [vec4()] * len(verts)
     self.phenos = phenos
-    self.tris = tris
\ No newline at end of file
+    self.tris = tris
+    self.points: list[vec4] | None = None
+    "unique positions of a welded mesh (see `weldMesh`), None if every vertex owns its position"
+    self.pointIndex: list[int] | None = None
+    "index into points per vertex, vertices at the same position share the same vec4"
\ No newline at end of file
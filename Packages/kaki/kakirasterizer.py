@@ -5,18 +5,31 @@ Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
 import math
 
 from kakibuffer import Buffer
+from kakigbuffer import GBuffer
+from kakigeometryarrays import FigureArray
 from kakigeometryutils import getFigurePlane
-from kakiprimitives import vec4, figure, phenotype, mesh
+from kakiprimitives import vec4, figure, phenotype, tri, mesh
 from kakirasterutils import (
   edgeFunction,
-  slpipPointInFigureCn,
-  slpipPointInFigureWn,
-  slpipScanFigure,
+  aetEdge,
+  aetBuildEdgeTable,
+  aetSpans,
+  aetSampleRange,
+  coverageAccumulate,
+  coverageRow,
 )
-from kakiutils import getBoundingBox, copyPhenotype, interpolatePhenotypes
+from kakiutils import getBoundingBox, vecnorm
 
 import kakiconfig as config
 
+# optional NumPy backend, chosen at import time
+try:
+  import kakinumpy
+except ImportError:
+  kakinumpy = None
+
+# kakiparallel (and with it the process pool machinery) is only imported once parallel rendering is actually used
+
 """
 Resources:
 
@@ -28,18 +41,52 @@ https://web.archive.org/web/20130126163405/http://geomalgorithms.com/a03-_inclus
 
 """
 
-def drawFigure(buffer: Buffer, figure: figure, fill: phenotype, fillRule: int = 0):
+def drawFigure(buffer: Buffer, figure: figure | FigureArray, fill: phenotype, fillRule: int = 0, antialias: bool = False):
   """Draws a figure onto buffer.
 
   Args:
     buffer (Buffer): target buffer
-    figure (figure): figure to draw
+    figure (figure | FigureArray): figure to draw
     fill (phenotype): fill style
     fillRule (int): fill rule (0 = even-odd, otherwise nonzero)
+    antialias (bool): if True, the exact area each sample's cell is covered by goes into its opacity, see `drawEdgesCoverage`
   """
+  isArray = isinstance(figure, FigureArray)
+  plane: vec4 | None = None
+  # if zbuffer is on,
+  if buffer.zbuffer:
+    # ... find plane equation
+    plane = figure.getPlane() if isArray else getFigurePlane(figure)
+
+  edges = figure.getEdges() if isArray else aetBuildEdgeTable(figure)
+
+  if antialias:
+    return drawEdgesCoverage(buffer, edges, fill, fillRule, plane)
+
+  if config.use_parallel and buffer.size >= config.parallel_min_samples:
+    import kakiparallel
+    if kakiparallel.drawEdges(buffer, edges, fill, fillRule, plane): return
 
-  # switch point in polygon function according to selected rule
-  pip = slpipPointInFigureCn if fillRule == 0 else slpipPointInFigureWn
+  drawEdges(buffer, edges, fill, fillRule, plane)
+
+def drawEdges(buffer: Buffer, edges: list[aetEdge], fill: phenotype, fillRule: int = 0, plane: vec4 | None = None):
+  """Fills the area enclosed by the edges of a figure onto buffer.
+
+  The area is filled span by span: for every scanline, the crossings of all active edges are sorted once
+  and the samples between them are filled in one go.
+
+  Args:
+    buffer (Buffer): target buffer
+    edges (list[aetEdge]): edge table of the figure, see `aetBuildEdgeTable`
+    fill (phenotype): fill style
+    fillRule (int): fill rule (0 = even-odd, otherwise nonzero)
+    plane (vec4 | None): plane equation of the figure, to compute z (requires a zbuffer)
+  """
+  if kakinumpy is not None and config.use_numpy:
+    return kakinumpy.drawEdges(buffer, edges, fill, fillRule, plane)
+
+  # drop cached resolve
+  buffer.resolved = None
 
   # cache some properties
   ovs = buffer.oversample
@@ -48,38 +95,113 @@ def drawFigure(buffer: Buffer, figure: figure, fill: phenotype, fillRule: int =
   w = buffer.width
   h = buffer.height
 
-  plane: vec4 | None
-  # if zbuffer is on,
-  if buffer.zbuffer:
-    # ... find plane equation
-    plane = getFigurePlane(figure)
+  # edges are sorted by y, the active ones are kept for the current scanline
+  edgeCnt = len(edges)
+  iedge = 0
+  active = []
 
-  # check all points buffer
-  p = vec4(0,0)
   for y in range(h * ovs):
-    p.y = y / ovs + oy
-    scanline = slpipScanFigure(figure, p.y)
-
-    for x in range(w * ovs):
-      p.x = x / ovs + ox
-      if (pip(scanline, p.x)):
-        i = y * w * ovs + x
-        if buffer.zbuffer is None:
-          buffer.data[i] = copyPhenotype(fill)
-        elif buffer.zbuffer:
-          zexist = buffer.zbuffer[i]
-          znew = (plane.w - plane.x * p.x - plane.y * p.y) / plane.z
-          if zexist is None or znew > zexist:
-            buffer.data[i] = copyPhenotype(fill)
+    py = y / ovs + oy
+    # activate edges starting at or below scanline, retire the ones ending at or below
+    while iedge < edgeCnt and edges[iedge][0] <= py:
+      active.append(edges[iedge])
+      iedge += 1
+    active = [e for e in active if e[1] > py]
+    if len(active) == 0:
+      continue
+
+    # compute x of edge-horizontal intersections once per scanline
+    crossings = sorted([(e[2] + (py - e[3]) / e[5] * e[4], e[6]) for e in active])
+
+    row = y * w * ovs
+    for span in aetSpans(crossings, fillRule):
+      x0, x1 = aetSampleRange(span[0], span[1], ox, ovs, w * ovs)
+      if plane is None or buffer.zbuffer is None:
+        buffer.fillSpan(row + x0, row + x1, fill)
+      else:
+        for x in range(x0, x1):
+          i = row + x
+          znew = (plane.w - plane.x * (x / ovs + ox) - plane.y * py) / plane.z
+          if znew > buffer.zbuffer[i]:
+            buffer.setSample(i, fill)
             buffer.zbuffer[i] = znew
 
-def drawTriangle(buffer: Buffer, verts: list[vec4], phenos: list[phenotype]):
-  """Draws a triangle onto buffer.
+def drawEdgesCoverage(buffer: Buffer, edges: list[aetEdge], fill: phenotype, fillRule: int = 0, plane: vec4 | None = None):
+  """Fills the area enclosed by the edges of a figure onto buffer, anti-aliased by exact area coverage.
+
+  Every sample stands for the cell to its upper right (1 / oversample pixels wide and high). The area of each cell
+  covered by the figure is computed analytically by accumulating the signed area under every edge, then written
+  into the opacity of the sample. Even without oversampling, edges come out smooth.
 
   Args:
     buffer (Buffer): target buffer
-    verts (list[vec2]): the three vertices of the triangle
-    phenos (list[phenotype]): phenotype per vertex
+    edges (list[aetEdge]): edge table of the figure, see `aetBuildEdgeTable`
+    fill (phenotype): fill style (its opacity is multiplied with the coverage)
+    fillRule (int): fill rule (0 = even-odd, otherwise nonzero)
+    plane (vec4 | None): plane equation of the figure, to compute z (requires a zbuffer)
+  """
+  # drop cached resolve
+  buffer.resolved = None
+
+  ovs = buffer.oversample
+  ox = buffer.originx
+  oy = buffer.originy
+  sw = buffer.width * ovs
+  sh = buffer.height * ovs
+  if sw == 0 or sh == 0: return
+
+  # accumulate all edges in cell units
+  stride = sw + 2
+  acc = [0.0] * (stride * sh)
+  for ylo, yhi, x0, y0, dx, dy, direction in edges:
+    coverageAccumulate(acc, stride, sh, (x0 - ox) * ovs, (y0 - oy) * ovs, (x0 + dx - ox) * ovs, (y0 + dy - oy) * ovs)
+
+  useZ = plane is not None and buffer.zbuffer is not None
+  zbuffer = buffer.zbuffer
+  pheno = phenotype(fill.vel, fill.pan, fill.rel, fill.pof, fill.cut, fill.res, fill.col, fill.opa)
+  for y in range(sh):
+    coverage = coverageRow(acc, y, stride, sw, fillRule)
+    row = y * sw
+    py = y / ovs + oy
+    x = 0
+    while x < sw:
+      c = coverage[x]
+      # ignore float noise
+      if c < 1e-9:
+        x += 1
+        continue
+      if c > 1 - 1e-9 and not useZ:
+        # fill fully covered runs at once
+        xe = x + 1
+        while xe < sw and coverage[xe] > 1 - 1e-9: xe += 1
+        buffer.fillSpan(row + x, row + xe, fill)
+        x = xe
+        continue
+      i = row + x
+      if useZ:
+        znew = (plane.w - plane.x * (x / ovs + ox) - plane.y * py) / plane.z
+        if znew > zbuffer[i]:
+          pheno.opa = fill.opa * min(c, 1.0)
+          buffer.setSample(i, pheno)
+          zbuffer[i] = znew
+      else:
+        pheno.opa = fill.opa * c
+        buffer.setSample(i, pheno)
+      x += 1
+
+def triangleSpans(buffer: Buffer, verts: list[vec4], e123: float):
+  """Yields the exact span of samples inside a triangle, row by row.
+
+  Each row is limited by solving the (linear) edge functions for x, corrected for rounding against
+  the same inclusion test as `edgeFunction` based rasterization.
+
+  Args:
+    buffer (Buffer): target buffer (or anything with the same size, origin and oversampling properties)
+    verts (list[vec4]): the three vertices of the triangle
+    e123 (float): edge function of the whole triangle (twice its signed area), must not be 0
+
+  Yields:
+    tuple[int, int, int, float, float, float]: sample row, first and last sample in row, edge functions e01, e12, e20 at the first sample
   """
   # minimize and clip rect to render in
   bbox = getBoundingBox(verts)
@@ -88,57 +210,359 @@ def drawTriangle(buffer: Buffer, verts: list[vec4], phenos: list[phenotype]):
   x1 = min(buffer.width, math.ceil(bbox.x1 - buffer.originx))
   y1 = min(buffer.height, math.ceil(bbox.y1 - buffer.originy))
 
-  # cache some properties
   ovs = buffer.oversample
   ox = buffer.originx
   oy = buffer.originy
+  p0x, p0y = verts[0].x, verts[0].y
+  p1x, p1y = verts[1].x, verts[1].y
+  p2x, p2y = verts[2].x, verts[2].y
+  sgn = 1 if e123 > 0 else -1
+
+  # edge functions are linear in the sample index x: e(x) = e(x=0) + de * x
+  de01 = -(p1y - p0y) / ovs
+  de12 = -(p2y - p1y) / ovs
+  de20 = -(p0y - p2y) / ovs
+
+  def edges(x: int, py: float):
+    px = x / ovs + ox
+    return (
+      (p1x - p0x) * (py - p0y) - (p1y - p0y) * (px - p0x),
+      (p2x - p1x) * (py - p1y) - (p2y - p1y) * (px - p1x),
+      (p0x - p2x) * (py - p2y) - (p0y - p2y) * (px - p2x),
+    )
+
+  def inside(x: int, py: float):
+    e01, e12, e20 = edges(x, py)
+    return sgn * e01 >= 0 and sgn * e12 >= 0 and sgn * e20 >= 0
+
+  xmin = x0 * ovs
+  xmax = x1 * ovs - 1
+  for y in range(y0 * ovs, y1 * ovs):
+    py = y / ovs + oy
+
+    # exact span limits for this row: each edge bounds x from one side (or the whole row)
+    xs = xmin
+    xe = xmax
+    e01, e12, e20 = edges(0, py)
+    for e, de in ((e01, de01), (e12, de12), (e20, de20)):
+      e *= sgn
+      de *= sgn
+      if de == 0:
+        if e < 0: xe = xs - 1
+      elif de > 0:
+        xs = max(xs, math.ceil(-e / de))
+      else:
+        xe = min(xe, math.floor(-e / de))
+    if xs > xe + 1: continue
+    # correct for rounding
+    while xs <= xe and not inside(xs, py): xs += 1
+    while xs > xmin and inside(xs - 1, py): xs -= 1
+    while xe >= xs and not inside(xe, py): xe -= 1
+    while xe < xmax and inside(xe + 1, py): xe += 1
+    if xs > xe: continue
+
+    yield (y, xs, xe, *edges(xs, py))
+
+def drawTriangle(buffer: Buffer, verts: list[vec4], phenos: list[phenotype]):
+  """Draws a triangle onto buffer.
+
+  The edge equations are set up once per triangle. Each row is limited to the exact span of samples inside
+  the triangle, within which the phenotype channels and z are stepped by their constant gradients.
+
+  Args:
+    buffer (Buffer): target buffer
+    verts (list[vec2]): the three vertices of the triangle
+    phenos (list[phenotype]): phenotype per vertex
+  """
+  if kakinumpy is not None and config.use_numpy:
+    return kakinumpy.drawTriangle(buffer, verts, phenos)
+
+  # drop cached resolve
+  buffer.resolved = None
+
+  # cache some properties
+  ovs = buffer.oversample
   w = buffer.width
-  p0 = verts[0]
-  p1 = verts[1]
-  p2 = verts[2]
-  e123 = edgeFunction(p0, p1, p2)
-  pheno0 = phenos[0]
-  pheno1 = phenos[1]
-  pheno2 = phenos[2]
+  zbuffer = buffer.zbuffer
+  cov = buffer.cov
+  bvel, bpan, brel, bpof = buffer.vel, buffer.pan, buffer.rel, buffer.pof
+  bcut, bres, bcol, bopa = buffer.cut, buffer.res, buffer.col, buffer.opa
+  p0z = verts[0].z
+  p1z = verts[1].z
+  p2z = verts[2].z
+  e123 = edgeFunction(verts[0], verts[1], verts[2])
 
   # nothing to do if the triangle has no area
   if e123 == 0: return
 
-  # check all points in bounding box
-  p = vec4(0,0)
-  for y in range(y0 * ovs, y1 * ovs):
-    p.y = y / ovs + oy
-    for x in range(x0 * ovs, x1 * ovs):
-      p.x = x / ovs + ox
-      # check if point is inside triangle
-      e01 = edgeFunction(p0, p1, p)
-      e12 = edgeFunction(p1, p2, p)
-      e20 = edgeFunction(p2, p0, p)
-      # allow CW and CCW triangles
-      if (e01 <= 0 and e12 <= 0 and e20 <= 0 and config.cull_backface
-          or e01 >= 0 and e12 >= 0 and e20 >= 0 and config.cull_frontface):
-        # interpolate phenotypes, wheighted according to distance to vertice
-        wgt0 = e12 / e123
-        wgt1 = e20 / e123
-        wgt2 = e01 / e123
-        pheno = interpolatePhenotypes([pheno0, pheno1, pheno2], [wgt0, wgt1, wgt2])
-        # put point
-        i = y * w * ovs + x
-        if buffer.zbuffer is None:
-          buffer.data[i] = pheno
-        elif buffer.zbuffer:
-          zexist = buffer.zbuffer[i]
-          znew = p0.z * wgt0 + p1.z * wgt1 + p2.z * wgt2
-          if zexist is None or znew > zexist:
-            buffer.data[i] = pheno
-            buffer.zbuffer[i] = znew
+  # all covered samples share the orientation of the triangle, so culling can be decided once
+  # CW triangles (e <= 0) are drawn if cull_backface, CCW ones (e >= 0) if cull_frontface
+  if e123 < 0 and not config.cull_backface: return
+  if e123 > 0 and not config.cull_frontface: return
+
+  # edge functions are linear in the sample index x: e(x) = e(x=0) + de * x
+  de01 = -(verts[1].y - verts[0].y) / ovs
+  de12 = -(verts[2].y - verts[1].y) / ovs
+  de20 = -(verts[0].y - verts[2].y) / ovs
+
+  # replace Nones with transparent phenotypes (as interpolatePhenotypes would)
+  ph0, ph1, ph2 = [phenotype(vel=0.0) if p is None else p for p in phenos]
+
+  # barycentric weights are e12, e20, e01 over e123, so each channel has a constant gradient along x
+  def gradient(c0: float, c1: float, c2: float):
+    return (c0 * de12 + c1 * de20 + c2 * de01) / e123
+
+  dvel = gradient(ph0.vel, ph1.vel, ph2.vel)
+  dpan = gradient(ph0.pan, ph1.pan, ph2.pan)
+  drel = gradient(ph0.rel, ph1.rel, ph2.rel)
+  dpof = gradient(ph0.pof, ph1.pof, ph2.pof)
+  dcut = gradient(ph0.cut, ph1.cut, ph2.cut)
+  dres = gradient(ph0.res, ph1.res, ph2.res)
+  dcol = gradient(ph0.col, ph1.col, ph2.col)
+  dopa = gradient(ph0.opa, ph1.opa, ph2.opa)
+  dz = gradient(p0z, p1z, p2z)
+
+  for y, xs, xe, e01, e12, e20 in triangleSpans(buffer, verts, e123):
+    # interpolate phenotypes at span start, wheighted according to distance to vertice
+    wgt0 = e12 / e123
+    wgt1 = e20 / e123
+    wgt2 = e01 / e123
+    vel = ph0.vel * wgt0 + ph1.vel * wgt1 + ph2.vel * wgt2
+    pan = ph0.pan * wgt0 + ph1.pan * wgt1 + ph2.pan * wgt2
+    rel = ph0.rel * wgt0 + ph1.rel * wgt1 + ph2.rel * wgt2
+    pof = ph0.pof * wgt0 + ph1.pof * wgt1 + ph2.pof * wgt2
+    cut = ph0.cut * wgt0 + ph1.cut * wgt1 + ph2.cut * wgt2
+    res = ph0.res * wgt0 + ph1.res * wgt1 + ph2.res * wgt2
+    col = ph0.col * wgt0 + ph1.col * wgt1 + ph2.col * wgt2
+    opa = ph0.opa * wgt0 + ph1.opa * wgt1 + ph2.opa * wgt2
+    z = p0z * wgt0 + p1z * wgt1 + p2z * wgt2
+
+    # ... and step along the span
+    row = y * w * ovs
+    for i in range(row + xs, row + xe + 1):
+      # put point
+      if zbuffer is None or z > zbuffer[i]:
+        cov[i] = 1
+        bvel[i] = vel
+        bpan[i] = pan
+        brel[i] = rel
+        bpof[i] = pof
+        bcut[i] = cut
+        bres[i] = res
+        bcol[i] = col
+        bopa[i] = opa
+        if zbuffer is not None:
+          zbuffer[i] = z
+      vel += dvel
+      pan += dpan
+      rel += drel
+      pof += dpof
+      cut += dcut
+      res += dres
+      col += dcol
+      opa += dopa
+      z += dz
+
+class MeshStats:
+  """Counts of what the triangle setup stage did with the triangles of a mesh.
+  """
+  __slots__ = ['drawn', 'backface', 'frontface', 'offscreen', 'degenerate']
+
+  def __init__(self):
+    self.drawn = 0
+    "triangles handed to the rasterizer"
+    self.backface = 0
+    "back facing (CW) triangles culled"
+    self.frontface = 0
+    "front facing (CCW) triangles culled"
+    self.offscreen = 0
+    "triangles entirely outside the buffer"
+    self.degenerate = 0
+    "triangles without area or too small to cover a single sample"
+
+  @property
+  def culled(self) -> int:
+    """total number of triangles culled"""
+    return self.backface + self.frontface + self.offscreen + self.degenerate
+
+def setupMesh(buffer: Buffer, mesh: mesh) -> tuple[list[tri], MeshStats]:
+  """Triangle setup stage: rejects all triangles of a mesh that wouldn't cover any sample of the buffer,
+  before any per-sample work is done.
+
+  Args:
+    buffer (Buffer): target buffer
+    mesh (mesh): mesh to draw
+
+  Returns:
+    tuple[list[tri], MeshStats]: triangles left to rasterize, statistics
+  """
+  stats = MeshStats()
+  tris = []
+
+  # cache some properties
+  ovs = buffer.oversample
+  ox = buffer.originx
+  oy = buffer.originy
+  bx1 = ox + buffer.width
+  by1 = oy + buffer.height
+  verts = mesh.verts
+  # samples sit at i / ovs + origin, tolerate rounding when looking for one within a bounding box
+  eps = 1e-9
 
-def drawMesh(buffer: Buffer, mesh: mesh):
   for tri in mesh.tris:
+    p0 = verts[tri[0]]
+    p1 = verts[tri[1]]
+    p2 = verts[tri[2]]
+    # signed area decides facing, see drawTriangle
+    e123 = edgeFunction(p0, p1, p2)
+    if e123 == 0:
+      stats.degenerate += 1
+      continue
+    if e123 < 0 and not config.cull_backface:
+      stats.backface += 1
+      continue
+    if e123 > 0 and not config.cull_frontface:
+      stats.frontface += 1
+      continue
+    # bounding box
+    xmin = min(p0.x, p1.x, p2.x)
+    xmax = max(p0.x, p1.x, p2.x)
+    ymin = min(p0.y, p1.y, p2.y)
+    ymax = max(p0.y, p1.y, p2.y)
+    if xmax < ox or ymax < oy or xmin >= bx1 or ymin >= by1:
+      stats.offscreen += 1
+      continue
+    # no sample column or row within the bounding box
+    if (math.ceil((xmin - ox) * ovs - eps) > math.floor((xmax - ox) * ovs + eps)
+        or math.ceil((ymin - oy) * ovs - eps) > math.floor((ymax - oy) * ovs + eps)):
+      stats.degenerate += 1
+      continue
+    tris.append(tri)
+
+  stats.drawn = len(tris)
+  return tris, stats
+
+def drawMesh(buffer: Buffer, mesh: mesh) -> MeshStats:
+  """Draws a mesh onto buffer.
+
+  Args:
+    buffer (Buffer): target buffer
+    mesh (mesh): mesh to draw
+
+  Returns:
+    MeshStats: how many triangles were drawn and culled
+  """
+  tris, stats = setupMesh(buffer, mesh)
+
+  if config.use_parallel and buffer.size >= config.parallel_min_samples:
+    import kakiparallel
+    if kakiparallel.drawTriangles(buffer, mesh, tris): return stats
+
+  for tri in tris:
     v0 = mesh.verts[tri[0]]
     v1 = mesh.verts[tri[1]]
     v2 = mesh.verts[tri[2]]
     p0 = mesh.phenos[tri[0]]
     p1 = mesh.phenos[tri[1]]
     p2 = mesh.phenos[tri[2]]
-    drawTriangle(buffer, [v0, v1, v2], [p0, p1, p2])
\ No newline at end of file
+    drawTriangle(buffer, [v0, v1, v2], [p0, p1, p2])
+  return stats
+
+def drawTriangleDeferred(gbuffer: GBuffer, verts: list[vec4], normals: list[vec4], material: int):
+  """Draws a triangle onto a G-buffer: only depth, interpolated normal and material ID are written.
+
+  Args:
+    gbuffer (GBuffer): target buffer
+    verts (list[vec4]): the three vertices of the triangle
+    normals (list[vec4]): normal per vertex (normalized)
+    material (int): material ID (see `GBuffer.addMaterial`)
+  """
+  if kakinumpy is not None and config.use_numpy:
+    return kakinumpy.drawTriangleDeferred(gbuffer, verts, normals, material)
+
+  e123 = edgeFunction(verts[0], verts[1], verts[2])
+  if e123 == 0: return
+  if e123 < 0 and not config.cull_backface: return
+  if e123 > 0 and not config.cull_frontface: return
+
+  ovs = gbuffer.oversample
+  w = gbuffer.width
+  zbuffer = gbuffer.zbuffer
+  mat = gbuffer.mat
+  bnx, bny, bnz = gbuffer.nx, gbuffer.ny, gbuffer.nz
+  n0, n1, n2 = normals
+  p0z = verts[0].z
+  p1z = verts[1].z
+  p2z = verts[2].z
+
+  # same stepping as drawTriangle, for 4 channels instead of 8 phenotype channels plus z
+  de01 = -(verts[1].y - verts[0].y) / ovs
+  de12 = -(verts[2].y - verts[1].y) / ovs
+  de20 = -(verts[0].y - verts[2].y) / ovs
+
+  def gradient(c0: float, c1: float, c2: float):
+    return (c0 * de12 + c1 * de20 + c2 * de01) / e123
+
+  dnx = gradient(n0.x, n1.x, n2.x)
+  dny = gradient(n0.y, n1.y, n2.y)
+  dnz = gradient(n0.z, n1.z, n2.z)
+  dz = gradient(p0z, p1z, p2z)
+
+  for y, xs, xe, e01, e12, e20 in triangleSpans(gbuffer, verts, e123):
+    wgt0 = e12 / e123
+    wgt1 = e20 / e123
+    wgt2 = e01 / e123
+    nx = n0.x * wgt0 + n1.x * wgt1 + n2.x * wgt2
+    ny = n0.y * wgt0 + n1.y * wgt1 + n2.y * wgt2
+    nz = n0.z * wgt0 + n1.z * wgt1 + n2.z * wgt2
+    z = p0z * wgt0 + p1z * wgt1 + p2z * wgt2
+
+    row = y * w * ovs
+    for i in range(row + xs, row + xe + 1):
+      if z > zbuffer[i]:
+        zbuffer[i] = z
+        mat[i] = material
+        bnx[i] = nx
+        bny[i] = ny
+        bnz[i] = nz
+      nx += dnx
+      ny += dny
+      nz += dnz
+      z += dz
+
+def drawMeshDeferred(gbuffer: GBuffer, mesh: mesh) -> MeshStats:
+  """Draws a mesh onto a G-buffer, to be lit per sample by `GBuffer.shade` afterwards.
+
+  The mesh has to be projected already, its normals (see `updateNormalsMesh`) still have to be the ones before
+  projection. Each triangle gets the material of its first vertex.
+
+  Args:
+    gbuffer (GBuffer): target buffer
+    mesh (mesh): mesh to draw
+
+  Returns:
+    MeshStats: how many triangles were drawn and culled
+  """
+  tris, stats = setupMesh(gbuffer, mesh)
+
+  # normalize the vertex normals once (they're sums of face normals)
+  normals = []
+  for n in mesh.normals:
+    norm = vecnorm(n)
+    normals.append(n if norm == 0 else vec4(n.x / norm, n.y / norm, n.z / norm))
+
+  # material IDs by phenotype object, most vertices share theirs
+  materials: dict[int, int] = {}
+  for tri in tris:
+    pheno = mesh.phenos[tri[0]]
+    material = materials.get(id(pheno))
+    if material is None:
+      material = gbuffer.addMaterial(pheno)
+      materials[id(pheno)] = material
+    drawTriangleDeferred(
+      gbuffer,
+      [mesh.verts[tri[0]], mesh.verts[tri[1]], mesh.verts[tri[2]]],
+      [normals[tri[0]], normals[tri[1]], normals[tri[2]]],
+      material,
+    )
+  return stats
\ No newline at end of file
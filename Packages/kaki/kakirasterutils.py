@@ -2,6 +2,9 @@
 Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
 """
 
+import itertools
+import math
+
 from kakiprimitives import vec4, box, figure
 from kakiutils import getBoundingBox
 
@@ -194,4 +197,168 @@ def slpipWindingNumber(scanline: slpipScanLine, x: float):
   return wn
 
 def slpipPointInFigureWn(scanline: slpipScanLine, x: float) -> bool:
-  return slpipWindingNumber(scanline, x) != 0
\ No newline at end of file
+  return slpipWindingNumber(scanline, x) != 0
+
+# active edge table based span filling (optimization)
+
+type aetEdge = tuple[float, float, float, float, float, float, int]
+"Type alias for an edge in the active edge table (ylo, yhi, x0, y0, dx, dy, direction)"
+
+def aetBuildEdgeTable(figure: figure) -> list[aetEdge]:
+  """Collects all non-horizontal edges of a figure, sorted by their lower y.
+
+  An edge is considered crossing a scanline at y if ylo <= y < yhi, which is the same rule the point in polygon checks use.
+
+  Args:
+    figure (figure): figure
+
+  Returns:
+    list[aetEdge]: edge table
+  """
+  edges: list[aetEdge] = []
+
+  for polygon in figure:
+    for i in range(len(polygon)):
+      p0 = polygon[i-1] # -1 will address last item
+      p1 = polygon[i]
+      dy = p1.y - p0.y
+      if dy > 0:    # "upward" edge
+        edges.append((p0.y, p1.y, p0.x, p0.y, p1.x - p0.x, dy, 1))
+      elif dy < 0:  # "downward" edge
+        edges.append((p1.y, p0.y, p0.x, p0.y, p1.x - p0.x, dy, -1))
+
+  edges.sort(key=lambda e: e[0])
+  return edges
+
+def aetSpans(crossings: list[tuple[float, int]], fillRule: int = 0) -> list[tuple[float, float]]:
+  """Turns the sorted crossings of one scanline into the spans that are inside the figure.
+
+  Args:
+    crossings (list[tuple[float, int]]): (x, direction) of all crossings, sorted by x
+    fillRule (int): fill rule (0 = even-odd, otherwise nonzero)
+
+  Returns:
+    list[tuple[float, float]]: spans [x0, x1) inside the figure
+  """
+  spans = []
+
+  # a point counts all crossings to its right, start with the leftmost interval
+  n = 0
+  for crossing in crossings:
+    n += 1 if fillRule == 0 else crossing[1]
+
+  x0 = -math.inf
+  for crossing in crossings:
+    x1 = crossing[0]
+    inside = n % 2 != 0 if fillRule == 0 else n != 0
+    if inside and x1 > x0:
+      # join with previous span if they touch
+      if spans and spans[-1][1] == x0:
+        spans[-1] = (spans[-1][0], x1)
+      else:
+        spans.append((x0, x1))
+    n -= 1 if fillRule == 0 else crossing[1]
+    x0 = x1
+
+  return spans
+
+def aetSampleRange(x0: float, x1: float, origin: float, ovs: int, count: int) -> tuple[int, int]:
+  """Returns the range of sample indices whose position (`i / ovs + origin`) lies within [x0, x1).
+
+  Args:
+    x0 (float): span start (inclusive)
+    x1 (float): span end (exclusive)
+    origin (float): buffer origin
+    ovs (int): oversampling
+    count (int): number of samples in this dimension
+
+  Returns:
+    tuple[int, int]: first index and index after the last
+  """
+  def firstAtOrAfter(x: float) -> int:
+    if x == -math.inf: return 0
+    if x == math.inf: return count
+    i = math.ceil((x - origin) * ovs)
+    # correct for rounding, sample positions are computed as i / ovs + origin
+    if (i - 1) / ovs + origin >= x: i -= 1
+    elif i / ovs + origin < x: i += 1
+    return min(max(i, 0), count)
+
+  return firstAtOrAfter(x0), firstAtOrAfter(x1)
+
+def coverageAccumulate(acc: list[float], stride: int, h: int, x0: float, y0: float, x1: float, y1: float):
+  """Accumulates the signed area a line leaves in the cells of a grid (as font rasterizers do).
+
+  Coordinates are in cell units. Each row of `acc` holds, per cell, the change of coverage compared to the cell
+  to its left, so the running sum along a row is the (signed) area covered within each cell. x is clamped to the
+  grid, which keeps the coverage of lines passing left of it.
+
+  Args:
+    acc (list[float]): accumulation buffer, h rows of `stride` cells
+    stride (int): cells per row, at least the grid width + 2
+    h (int): number of rows
+    x0, y0, x1, y1 (float): the line
+  """
+  if y0 == y1: return
+  direction = 1.0
+  if y0 > y1:
+    direction = -1.0
+    x0, y0, x1, y1 = x1, y1, x0, y0
+  w = stride - 2
+  dxdy = (x1 - x0) / (y1 - y0)
+  ystart = max(y0, 0)
+  yend = min(y1, h)
+  if ystart >= yend: return
+
+  for row in range(int(ystart), math.ceil(yend)):
+    ya = max(row, ystart)
+    yb = min(row + 1, yend)
+    d = (yb - ya) * direction
+    xa = min(max(x0 + (ya - y0) * dxdy, 0), w)
+    xb = min(max(x0 + (yb - y0) * dxdy, 0), w)
+    if xa > xb: xa, xb = xb, xa
+    base = row * stride
+    xai = math.floor(xa)
+    xbi = math.ceil(xb)
+    if xbi <= xai + 1:
+      # within one cell: the part to the right of the line's mid point is covered
+      xmf = 0.5 * (xa + xb) - xai
+      acc[base + xai] += d - d * xmf
+      acc[base + xai + 1] += d * xmf
+    else:
+      # across cells: triangle in the first and last cell, constant steps in between
+      s = 1 / (xb - xa)
+      xaf = xa - xai
+      a0 = 0.5 * s * (1 - xaf) * (1 - xaf)
+      xbf = xb - xbi + 1
+      am = 0.5 * s * xbf * xbf
+      acc[base + xai] += d * a0
+      if xbi == xai + 2:
+        acc[base + xai + 1] += d * (1 - a0 - am)
+      else:
+        a1 = s * (1.5 - xaf)
+        acc[base + xai + 1] += d * (a1 - a0)
+        for xi in range(xai + 2, xbi - 1):
+          acc[base + xi] += d * s
+        a2 = a1 + (xbi - xai - 3) * s
+        acc[base + xbi - 1] += d * (1 - a2 - am)
+      acc[base + xbi] += d * am
+
+def coverageRow(acc: list[float], row: int, stride: int, w: int, fillRule: int = 0) -> list[float]:
+  """Returns the coverage (0 to 1) of the cells of a row of an accumulation buffer (see `coverageAccumulate`).
+
+  Args:
+    fillRule (int): fill rule (0 = even-odd, otherwise nonzero)
+  """
+  base = row * stride
+  coverage = []
+  for a in itertools.accumulate(acc[base:base + w]):
+    a = abs(a)
+    if fillRule == 0:
+      # fold the winding number, every second overlap is outside
+      a %= 2
+      if a > 1: a = 2 - a
+    elif a > 1:
+      a = 1.0
+    coverage.append(a)
+  return coverage
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Render cache for dialog previews.
+
+Dialogs re-run their whole pipeline on every change of an input. Most of the time only a few inputs change though
+(e.g. while scrubbing a knob). The render cache keeps the rasterized, not yet post-processed buffers keyed by all
+inputs that affect the rasterization, except for the screen space position: a render that only moved by whole pixels
+is the same render with its notes shifted. Positions are snapped to a sub-pixel grid (see `RenderCache.snap`), so a
+knob moving the figure lands on a few sub-pixel positions only and renders are reused while dragging.
+
+Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
+"""
+
+from collections import OrderedDict
+
+from kakiprimitives import box
+
+class RenderCache:
+  """Keeps the last few renders of a preview, see module description.
+
+  Usage: look up a render with `get`, on a miss rasterize and `put` the result. Cached renders must not be
+  changed, post-processing (fog etc.) has to work on a copy.
+  """
+  def __init__(self, limit: box, size: int = 8):
+    self.limit = limit
+    "box renders are limited to, renders that don't fit entirely aren't cached"
+    self.size = size
+    "how many renders are kept"
+    self.entries: OrderedDict[tuple, tuple[float, float, box, object]] = OrderedDict()
+    "position, bounding box and render per key, least recently used first"
+
+  def snap(self, x: float, y: float, phases: int = 8) -> tuple[float, float]:
+    """Snaps a screen space position to the sub-pixel grid renders are cached on.
+
+    Args:
+      x (float): screen space x position (in pixels)
+      y (float): screen space y position (in pixels)
+      phases (int, optional): sub-pixel positions per pixel, a power of two (e.g. samples per pixel). Defaults to 8.
+
+    Returns:
+      tuple[float, float]: snapped x, y
+    """
+    return round(x * phases) / phases, round(y * phases) / phases
+
+  def getKey(self, key: tuple, x: float, y: float) -> tuple:
+    """Returns the internal key of a render."""
+    # only renders with the same sub-pixel position can be shifted onto each other
+    return (key, x % 1, y % 1)
+
+  def fits(self, bbox: box) -> bool:
+    """Tells whether a bounding box lies entirely within the limit."""
+    limit = self.limit
+    return bbox.x0 >= limit.x0 and bbox.y0 >= limit.y0 and bbox.x1 <= limit.x1 and bbox.y1 <= limit.y1
+
+  def get(self, key: tuple, x: float, y: float) -> tuple[object, box] | None:
+    """Looks up a render.
+
+    Args:
+      key (tuple): all inputs that affect the rasterization, except for the screen space position
+      x (float): screen space x position (in pixels) to render at
+      y (float): screen space y position (in pixels) to render at
+
+    Returns:
+      tuple[object, box] | None: cached render and its bounding box moved to x, y, None if there's none that fits or x, y
+        isn't exactly a whole number of pixels away from where it was rendered
+    """
+    k = self.getKey(key, x, y)
+    entry = self.entries.get(k)
+    if entry is None: return None
+    ex, ey, ebox, data = entry
+    dx = x - ex
+    dy = y - ey
+    # same sub-pixel position isn't enough, the render has to be moved by exactly whole pixels
+    if not (float(dx).is_integer() and float(dy).is_integer()): return None
+    dx = int(dx)
+    dy = int(dy)
+    bbox = box(ebox.x0 + dx, ebox.y0 + dy, ebox.x1 + dx, ebox.y1 + dy)
+    # moved out of the limit, parts of it have to be cut off
+    if not self.fits(bbox): return None
+    self.entries.move_to_end(k)
+    return data, bbox
+
+  def put(self, key: tuple, x: float, y: float, bbox: box, data: object):
+    """Stores a render.
+
+    Args:
+      key (tuple): all inputs that affect the rasterization, except for the screen space position
+      x (float): screen space x position (in pixels) rendered at
+      y (float): screen space y position (in pixels) rendered at
+      bbox (box): bounding box of the render, before it was limited
+      data (object): the render (e.g. a Buffer before fog)
+    """
+    if not self.fits(bbox): return
+    k = self.getKey(key, x, y)
+    self.entries[k] = (x, y, box(bbox.x0, bbox.y0, bbox.x1, bbox.y1), data)
+    self.entries.move_to_end(k)
+    # evict least recently used
+    while len(self.entries) > self.size:
+      self.entries.popitem(last=False)
\ No newline at end of file
@@ -5,15 +5,55 @@ Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
 import flpianoroll
 
 from kakibuffer import Buffer
+from kakipalette import PaletteBuffer, EMPTY
 
-def render(buffer: Buffer, xoff: int, yoff: int, pixelWidth: int = int(flpianoroll.score.PPQ / 4)) -> list[flpianoroll.Note]:
+def quantizeNote(note: flpianoroll.Note) -> tuple[int, int, int, int, int, int, int]:
+  """Returns the properties of a note the way FL stores them
+  (velocity, pan, release in 1/128 steps, pitch offset, fcut, fres in 1/255 steps, color).
+  """
+  return (
+    round(note.velocity * 128),
+    round(note.pan * 128),
+    round(note.release * 128),
+    note.pitchofs,
+    round(note.fcut * 255),
+    round(note.fres * 255),
+    note.color,
+  )
+
+def render(buffer: Buffer | PaletteBuffer, xoff: int, yoff: int, pixelWidth: int | None = None, merge: bool = False, mergeTolerance: int = 0, quantize: bool = False) -> list[flpianoroll.Note]:
   """Renders a buffer into flpianoroll.Notes
+
+  Args:
+    buffer (Buffer | PaletteBuffer): buffer to render
+    xoff (int): x offset in pixels
+    yoff (int): y offset in pixels (i.e. note number of the bottom row)
+    pixelWidth (int | None): length of one pixel in ticks, None for a 16th note
+    merge (bool): if True, horizontally adjacent pixels are merged into one longer note if their quantized properties match
+    mergeTolerance (int): largest difference (in quantization steps, see `quantizeNote`) per property that still counts as match, color has to match exactly
+    quantize (bool): if True, a Buffer is quantized into a PaletteBuffer first, once it's fully rasterized (see `PaletteBuffer.fromBuffer`)
+
+  Returns:
+    list[flpianoroll.Note]: rendered notes
   """
+  if pixelWidth is None:
+    pixelWidth = int(flpianoroll.score.PPQ / 4)
+  if quantize and isinstance(buffer, Buffer):
+    buffer = PaletteBuffer.fromBuffer(buffer)
+  if isinstance(buffer, PaletteBuffer):
+    return renderPalette(buffer, xoff, yoff, pixelWidth, merge, mergeTolerance)
+
   notes = []
 
+  # downsample once, so all pixels can be read directly
+  buffer = buffer.resolve()
+
   for iy in range(buffer.height):
     y = yoff + iy
     if y >= 0 and y <= 131:
+      # note (and its quantized properties) that can be extended by the next pixel
+      run: flpianoroll.Note | None = None
+      runq = None
       for ix in range(buffer.width):
         x = xoff + ix
         if x >= 0:
@@ -32,6 +72,78 @@ def render(buffer: Buffer, xoff: int, yoff: int, pixelWidth: int = int(flpianoro
             note.fcut = pheno.cut
             note.fres = pheno.res
             note.color = round(pheno.col) # can be float due to interpolation
+            if merge:
+              q = quantizeNote(note)
+              if (run is not None and q[6] == runq[6]
+                  and all(abs(q[k] - runq[k]) <= mergeTolerance for k in range(6))):
+                run.length += pixelWidth
+                continue
+              run = note
+              runq = q
+            notes.append(note)
+            continue
+        # gap, nothing to extend
+        run = None
+
+  return notes
+
+def renderPalette(buffer: PaletteBuffer, xoff: int, yoff: int, pixelWidth: int, merge: bool = False, mergeTolerance: int = 0) -> list[flpianoroll.Note]:
+  """Renders a palette buffer into flpianoroll.Notes, see `render`.
+
+  Note properties are computed once per palette entry. Entries that end up as the same note properties share a note
+  ID, so merging pixels is a comparison of IDs (unless there's a tolerance).
+  """
+  notes = []
+  palette = buffer.palette
+
+  # quantized note properties per palette index, and note ID per palette index
+  props: list[tuple[int, int, int, int, int, int, int]] = []
+  noteIds: list[int] = []
+  propIds: dict[tuple, int] = {}
+  for q in palette.entries:
+    p = (round(q[0] * q[7] / 255), q[1], q[2], q[3], q[4], q[5], q[6])
+    props.append(p)
+    noteIds.append(propIds.setdefault(p, len(propIds)))
+
+  w = buffer.width
+  index = buffer.index
+  for iy in range(buffer.height):
+    y = yoff + iy
+    if y >= 0 and y <= 131:
+      # note (and the palette index it was created from) that can be extended by the next pixel
+      run: flpianoroll.Note | None = None
+      runIndex = EMPTY
+      for ix in range(w):
+        x = xoff + ix
+        if x >= 0:
+          i = index[iy * w + ix]
+          if i != EMPTY:
+            p = props[i]
+            if merge and run is not None:
+              r = props[runIndex]
+              if (noteIds[i] == noteIds[runIndex] or (mergeTolerance > 0 and p[6] == r[6]
+                  and all(abs(p[k] - r[k]) <= mergeTolerance for k in range(6)))):
+                run.length += pixelWidth
+                continue
+            note = flpianoroll.Note()
+            # position note
+            note.time = x * pixelWidth
+            note.number = y
+            note.length = pixelWidth
+            # apply attributes
+            note.velocity = p[0] / 128
+            note.pan = p[1] / 128
+            note.release = p[2] / 128
+            note.pitchofs = p[3]
+            note.fcut = p[4] / 255
+            note.fres = p[5] / 255
+            note.color = p[6]
+            if merge:
+              run = note
+              runIndex = i
             notes.append(note)
+            continue
+        # gap, nothing to extend
+        run = None
 
   return notes
\ No newline at end of file
@@ -3,11 +3,35 @@ Copyright 2024 Olivier Stuker a.k.a. BinaryBorn
 """
 
 import math
+from collections import OrderedDict
 
-from kakigeometryutils import transformPoints
+from kakigeometryutils import transformPoints, cloneMeshShared, weldMesh
 from kakiprimitives import vec4, phenotype, tri, mesh
 from kakiutils import identity4, translate, rotateX, rotateY, transform, copyPhenotype, copyVec
 
+meshCacheSize = 16
+"how many meshes `cachedMesh` keeps"
+meshCache: OrderedDict[tuple, mesh] = OrderedDict()
+"meshes created by `cachedMesh`, least recently used first"
+
+def cachedMesh(create: callable, pheno: phenotype, *args) -> mesh:
+  """Returns a mesh created by one of the shape functions of this module, e.g. `cachedMesh(createTorus, pheno, 24, 0.5)`.
+
+  Meshes are cached by shape function, arguments and material phenotype, so repeated calls with the same
+  parameters only cost a cheap clone (see `cloneMeshShared`), which can be transformed and lit like a fresh mesh.
+  """
+  key = (create.__name__, args, pheno.vel, pheno.pan, pheno.rel, pheno.pof, pheno.cut, pheno.res, pheno.col, pheno.opa)
+  msh = meshCache.get(key)
+  if msh is None:
+    msh = create(pheno, *args)
+    meshCache[key] = msh
+    # evict least recently used
+    while len(meshCache) > meshCacheSize:
+      meshCache.popitem(last=False)
+  else:
+    meshCache.move_to_end(key)
+  return cloneMeshShared(msh)
+
 def createCube(pheno: phenotype) -> mesh:
   """Creates a cube with side length 1.
   """
@@ -45,7 +69,7 @@ def createCube(pheno: phenotype) -> mesh:
 
   phenos = [copyPhenotype(pheno) for v in verts]
   
-  return mesh(verts, phenos, tris)
+  return weldMesh(mesh(verts, phenos, tris))
 
 def createPrism(pheno: phenotype, sides: int, rtop: float = 1.0) -> mesh:
   """Creates a prism with outer diameter 1.
@@ -100,7 +124,7 @@ def createPrism(pheno: phenotype, sides: int, rtop: float = 1.0) -> mesh:
   
   phenos = [copyPhenotype(pheno) for v in verts]
 
-  return mesh(verts, phenos, tris)
+  return weldMesh(mesh(verts, phenos, tris))
 
 def createSphere(pheno: phenotype, sides: int) -> mesh:
   """Creates a sphere with diameter 1.
@@ -149,7 +173,7 @@ def createSphere(pheno: phenotype, sides: int) -> mesh:
 
   phenos = [copyPhenotype(pheno) for v in verts]
   
-  return mesh(verts, phenos, tris)
+  return weldMesh(mesh(verts, phenos, tris))
 
 def createCylinder(pheno: phenotype, sides: int, rtop: float = 1.0) -> mesh:
   """Creates a cylinder with diameter 1.
@@ -206,7 +230,7 @@ def createCylinder(pheno: phenotype, sides: int, rtop: float = 1.0) -> mesh:
   
   phenos = [copyPhenotype(pheno) for v in verts]
 
-  return mesh(verts, phenos, tris)
+  return weldMesh(mesh(verts, phenos, tris))
 
 def createTorus(pheno: phenotype, sides: int, ratio: float = 1.0) -> mesh:
   """Creates a torus with big diameter 1.
@@ -247,7 +271,7 @@ def createTorus(pheno: phenotype, sides: int, ratio: float = 1.0) -> mesh:
   
   phenos = [copyPhenotype(pheno) for v in verts]
 
-  return mesh(verts, phenos, tris)
+  return weldMesh(mesh(verts, phenos, tris))
 
 def createStar(pheno: phenotype, sides: int, ratio: float = 1.0) -> mesh:
   """Creates a star with outer diameter 1.
@@ -307,4 +331,4 @@ def createStar(pheno: phenotype, sides: int, ratio: float = 1.0) -> mesh:
   
   phenos = [copyPhenotype(pheno) for v in verts]
 
-  return mesh(verts, phenos, tris)
\ No newline at end of file
+  return weldMesh(mesh(verts, phenos, tris))
\ No newline at end of file
@@ -305,3 +305,103 @@ def perspectiveTransform(mat: mat4, pinch: float) -> mat4:
   # the -pinch is because -Z is into screen
   # the w=1 part is because the projection plane is at 0, thus @z=0 w has to be 1 for a /1 division
   return matmul4(tr, mat)
+
+
+class TransformBuilder:
+  """Composes a chain of transformations into one matrix, in place.
+
+  Gives the same matrix as chaining `translate`, `scale`, `rotateX` etc., without allocating a new matrix per step:
+  `TransformBuilder().scale(2, 2).rotateZ(phi).translate(x, y).build()`
+  """
+  __slots__ = ['mat']
+
+  def __init__(self, mat: mat4 | None = None):
+    self.mat = identity4() if mat is None else matmul4(identity4(), mat)
+    "matrix built so far"
+
+  def build(self) -> mat4:
+    """Returns (a copy of) the composed matrix."""
+    return matmul4(identity4(), self.mat)
+
+  def transform(self, t: mat4) -> 'TransformBuilder':
+    """Applies an arbitrary transformation matrix after the ones so far."""
+    self.mat = matmul4(t, self.mat)
+    return self
+
+  def translate(self, x: float, y: float, z: float = 0.0) -> 'TransformBuilder':
+    """Translates by x, y, z, see `translate`."""
+    m = self.mat
+    m.a11 += x * m.a41
+    m.a12 += x * m.a42
+    m.a13 += x * m.a43
+    m.a14 += x * m.a44
+    m.a21 += y * m.a41
+    m.a22 += y * m.a42
+    m.a23 += y * m.a43
+    m.a24 += y * m.a44
+    m.a31 += z * m.a41
+    m.a32 += z * m.a42
+    m.a33 += z * m.a43
+    m.a34 += z * m.a44
+    return self
+
+  def scale(self, sx: float, sy: float, sz: float = 1.0) -> 'TransformBuilder':
+    """Scales by sx, sy, sz, see `scale`."""
+    m = self.mat
+    m.a11 *= sx
+    m.a12 *= sx
+    m.a13 *= sx
+    m.a14 *= sx
+    m.a21 *= sy
+    m.a22 *= sy
+    m.a23 *= sy
+    m.a24 *= sy
+    m.a31 *= sz
+    m.a32 *= sz
+    m.a33 *= sz
+    m.a34 *= sz
+    return self
+
+  def rotateX(self, phi: float) -> 'TransformBuilder':
+    """Rotates around x by phi, see `rotateX`."""
+    m = self.mat
+    c = math.cos(phi)
+    s = math.sin(phi)
+    m.a21, m.a31 = c * m.a21 - s * m.a31, s * m.a21 + c * m.a31
+    m.a22, m.a32 = c * m.a22 - s * m.a32, s * m.a22 + c * m.a32
+    m.a23, m.a33 = c * m.a23 - s * m.a33, s * m.a23 + c * m.a33
+    m.a24, m.a34 = c * m.a24 - s * m.a34, s * m.a24 + c * m.a34
+    return self
+
+  def rotateY(self, phi: float) -> 'TransformBuilder':
+    """Rotates around y by phi, see `rotateY`."""
+    m = self.mat
+    c = math.cos(phi)
+    s = math.sin(phi)
+    m.a11, m.a31 = c * m.a11 + s * m.a31, -s * m.a11 + c * m.a31
+    m.a12, m.a32 = c * m.a12 + s * m.a32, -s * m.a12 + c * m.a32
+    m.a13, m.a33 = c * m.a13 + s * m.a33, -s * m.a13 + c * m.a33
+    m.a14, m.a34 = c * m.a14 + s * m.a34, -s * m.a14 + c * m.a34
+    return self
+
+  def rotateZ(self, phi: float) -> 'TransformBuilder':
+    """Rotates around z by phi, see `rotateZ`."""
+    m = self.mat
+    c = math.cos(phi)
+    s = math.sin(phi)
+    m.a11, m.a21 = c * m.a11 - s * m.a21, s * m.a11 + c * m.a21
+    m.a12, m.a22 = c * m.a12 - s * m.a22, s * m.a12 + c * m.a22
+    m.a13, m.a23 = c * m.a13 - s * m.a23, s * m.a13 + c * m.a23
+    m.a14, m.a24 = c * m.a14 - s * m.a24, s * m.a14 + c * m.a24
+    return self
+
+  rotate = rotateZ
+
+  def perspectiveTransform(self, pinch: float) -> 'TransformBuilder':
+    """Increases the homogeneous component, see `perspectiveTransform`."""
+    m = self.mat
+    m.a41 -= pinch * m.a31
+    m.a42 -= pinch * m.a32
+    m.a43 -= pinch * m.a33
+    m.a44 -= pinch * m.a34
+    return self
\ No newline at end of file
@@ -0,0 +1,78 @@
+# Regression check for nbpcore.exclude_overlaps_from_pitches, run outside of FL
+# Studio: python check_overlaps.py [rounds]
+#
+# Compares the sweep against the pairwise containment test of the original
+# implementation (a note is dropped if another note of its pitch starts earlier
+# and ends later) on randomized pitches.
+
+import random
+import sys
+import types
+
+# nbpcore star-imports flpianoroll, which only exists inside FL Studio
+sys.modules.setdefault('flpianoroll', types.ModuleType('flpianoroll'))
+
+import nbpcore  # noqa: E402
+
+
+class Note:
+  def __init__(self, number, time, length):
+    self.number = number
+    self.time = time
+    self.length = length
+
+
+def exclude_overlaps_reference(notes):
+  kept = []
+
+  for j in range(len(notes)):
+    contained = False
+    for i in range(len(notes)):
+      if notes[i][0].time < notes[j][0].time and nbpcore.note_end_time(
+        notes[i][0]
+      ) > nbpcore.note_end_time(notes[j][0]):
+        contained = True
+        break
+    if not contained:
+      kept.append(notes[j])
+
+  return kept
+
+
+def random_pitches(rng):
+  pitches = {}
+  count = rng.randint(0, 40)
+  # small grid, so equal start and end times are common
+  grid = rng.choice([1, 4, 24, 96])
+
+  for i in range(count):
+    note = Note(
+      rng.randint(60, 63), rng.randint(0, 16) * grid, rng.randint(0, 8) * grid
+    )
+    pitches.setdefault(note.number, []).append((note, i))
+
+  if rng.random() < 0.5:
+    nbpcore.sort_pitches_by_time(pitches)
+
+  return pitches
+
+
+def main():
+  rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+  rng = random.Random(0)
+
+  for r in range(rounds):
+    pitches = random_pitches(rng)
+    result = nbpcore.exclude_overlaps_from_pitches(pitches)
+
+    assert result.keys() == pitches.keys(), r
+    for pitch, notes in pitches.items():
+      expected = [i for _, i in exclude_overlaps_reference(notes)]
+      actual = [i for _, i in result[pitch]]
+      assert actual == expected, (r, pitch, actual, expected)
+
+  sys.stdout.write(f'{rounds} rounds ok\n')
+
+
+if __name__ == '__main__':
+  main()
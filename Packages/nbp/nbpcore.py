@@ -1,3 +1,5 @@
+from bisect import bisect_left
+
 from flpianoroll import *
 
 
@@ -10,6 +12,54 @@ def clear_notes():
     score.deleteNote(0)
 
 
+NOTE_PROPERTIES = (
+  'number',
+  'time',
+  'length',
+  'group',
+  'pan',
+  'velocity',
+  'release',
+  'color',
+  'fcut',
+  'fres',
+  'pitchofs',
+  'repeats',
+  'slide',
+  'porta',
+  'muted',
+  'selected',
+)
+
+
+def commit_notes(survivors, new_notes=()):
+  # brings the score into the desired state, instead of clearing it and adding
+  # everything again:
+  #   survivors  {score index: note with the desired properties}, these notes
+  #              are changed in place (so they keep their identity)
+  #   new_notes  notes to add
+  # every other note is deleted. returns how many API calls (deletes and adds)
+  # were saved compared to clear_notes and re-adding
+  count = score.noteCount
+
+  for i, desired in survivors.items():
+    note = score.getNote(i)
+    for prop in NOTE_PROPERTIES:
+      value = getattr(desired, prop)
+      if getattr(note, prop) != value:
+        setattr(note, prop, value)
+
+  # from highest to lowest index, so the indices left to delete stay valid
+  for i in range(count - 1, -1, -1):
+    if i not in survivors:
+      score.deleteNote(i)
+
+  for note in new_notes:
+    score.addNote(note)
+
+  return 2 * len(survivors)
+
+
 def get_notes_list():
   notes = []
 
@@ -85,24 +135,105 @@ def exclude_overlaps_from_pitches(pitches):
   new_pitches = {}
 
   for pitch, notes in pitches.items():
-    new_notes = []
-    excluded = {}
-
-    for i in range(0, len(notes)):
-      for j in range(0, len(notes)):
-        if notes[j][1] in excluded:
-          continue
-        if notes[i][0].time < notes[j][0].time and note_end_time(
-          notes[i][0]
-        ) > note_end_time(notes[j][0]):
-          excluded[notes[j][1]] = True
-          continue
-        new_notes.append(notes[j])
-
-    new_pitches[pitch] = new_notes
+    # sweep by start time: a note is contained in another one if a note that
+    # starts earlier ends later (notes starting at the same time can't contain
+    # each other)
+    order = sorted(range(len(notes)), key=lambda k: notes[k][0].time)
+    contained = [False] * len(notes)
+    max_end = None
+    group_time = None
+    group_end = None
+
+    for k in order:
+      note = notes[k][0]
+      if note.time != group_time:
+        if group_end is not None and (max_end is None or group_end > max_end):
+          max_end = group_end
+        group_time = note.time
+        group_end = None
+
+      end = note_end_time(note)
+      if max_end is not None and max_end > end:
+        contained[k] = True
+      if group_end is None or end > group_end:
+        group_end = end
+
+    new_pitches[pitch] = [n for n, c in zip(notes, contained) if not c]
 
   return new_pitches
 
 
 def note_end_time(note):
   return note.time + note.length
+
+
+class PitchIndex:
+  # all notes of the score grouped by pitch, built in one pass over score
+  #   notes[pitch]       (note, score index) in score order
+  #   by_time[pitch]     the same sorted by start time
+  #   by_end_time[pitch] the same sorted by end time (ties keep score order)
+  #   starts[pitch]      start times, in order of by_time
+  #   ends[pitch]        end times, in order of by_end_time
+  # times are taken when the index is built, changing notes doesn't update it
+
+  def __init__(self):
+    self.notes = {}
+    self.by_time = {}
+    self.by_end_time = {}
+    self.starts = {}
+    self.ends = {}
+    self.min_time = None
+    self.max_end_time = None
+
+    for i in range(score.noteCount):
+      note = score.getNote(i)
+
+      if note.number not in self.notes:
+        self.notes[note.number] = [(note, i)]
+      else:
+        self.notes[note.number].append((note, i))
+
+      end = note_end_time(note)
+      if self.min_time is None or note.time < self.min_time:
+        self.min_time = note.time
+      if self.max_end_time is None or end > self.max_end_time:
+        self.max_end_time = end
+
+    for pitch, notes in self.notes.items():
+      by_time = sorted(notes, key=lambda x: x[0].time)
+      by_end_time = sorted(notes, key=lambda x: note_end_time(x[0]))
+      self.by_time[pitch] = by_time
+      self.by_end_time[pitch] = by_end_time
+      self.starts[pitch] = [n.time for n, i in by_time]
+      self.ends[pitch] = [note_end_time(n) for n, i in by_end_time]
+
+  def __len__(self):
+    return len(self.notes)
+
+  def pitches_by_time(self):
+    # fresh lists, to be changed freely (like sort_pitches_by_time)
+    return {pitch: list(notes) for pitch, notes in self.by_time.items()}
+
+  def pitches_by_end_time(self):
+    # fresh lists, to be changed freely (like sort_pitches_by_end_time)
+    return {pitch: list(notes) for pitch, notes in self.by_end_time.items()}
+
+  def first(self, pitch):
+    return self.by_time[pitch][0]
+
+  def last(self, pitch):
+    return self.by_end_time[pitch][-1]
+
+  def starting_between(self, pitch, t0, t1):
+    # notes of a pitch with t0 <= start time < t1, sorted by start time
+    starts = self.starts.get(pitch, [])
+    lo = bisect_left(starts, t0)
+    hi = bisect_left(starts, t1, lo)
+    return self.by_time[pitch][lo:hi] if hi > lo else []
+
+  def ending_between(self, pitch, t0, t1):
+    # notes of a pitch with t0 <= end time < t1, sorted by end time
+    ends = self.ends.get(pitch, [])
+    lo = bisect_left(ends, t0)
+    hi = bisect_left(ends, t1, lo)
+    return self.by_end_time[pitch][lo:hi] if hi > lo else []